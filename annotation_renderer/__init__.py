@@ -0,0 +1 @@
+from .annotation_renderer import AnnotationRenderer, OverlaySidecarReader, RENDER_LAYERS, OVERLAY_SIDECAR_VERSION
\ No newline at end of file
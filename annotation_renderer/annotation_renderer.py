@@ -0,0 +1,200 @@
+import collections
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import sys 
+sys.path.append('../')
+from utils import draw_ellipse, draw_triangle, draw_ball_control_panel, draw_camera_movement_panel, draw_speed_and_distance_text, bgr_to_hex, MatchStats, atomic_write
+
+# In drawing order
+RENDER_LAYERS = ('players', 'referees', 'ball', 'ball_control', 'camera_movement', 'speed_and_distance')
+OVERLAY_SIDECAR_VERSION = 1
+# Players without a team are drawn in red
+UNASSIGNED_TEAM_COLOR = (0,0,255)
+
+class AnnotationRenderer():
+    # Draws every overlay of the output video in one pass over each frame, in
+    # place and straight from the TrackStore columns. Produces the same pixels
+    # as Tracker.draw_frame_annotations followed by the camera movement and
+    # speed/distance passes, without their frame copies: semi-transparent
+    # panels are blended over their own rectangle only.
+    def __init__(self, tracks, match_stats, camera_movement_per_frame, layers=None):
+        layers = RENDER_LAYERS if layers is None else tuple(layers)
+        unknown = set(layers) - set(RENDER_LAYERS)
+        if unknown:
+            raise ValueError(f"Unknown render layers: {sorted(unknown)}. Expected any of {RENDER_LAYERS}")
+        if not isinstance(match_stats, MatchStats):
+            match_stats = MatchStats(match_stats, tracks)
+        self.tracks = tracks
+        self.match_stats = match_stats
+        self.camera_movement_per_frame = camera_movement_per_frame
+        self.layers = [layer for layer in RENDER_LAYERS if layer in layers]
+
+    def render(self, frame, frame_num):
+        for layer in self.layers:
+            getattr(self, f"draw_{layer}")(frame, frame_num)
+        return frame
+
+    def render_frames(self, frames, num_workers=1, max_pending=None):
+        # Renders a stream of frames and yields them in their original order.
+        # With several workers frames are drawn concurrently on a thread pool
+        # (cv2 drawing releases the GIL) and kept in a bounded reorder buffer,
+        # so rendering runs ahead of the writer without holding the video.
+        if num_workers <= 1:
+            for frame_num, frame in enumerate(frames):
+                yield self.render(frame, frame_num)
+            return
+        max_pending = max_pending or 2 * num_workers
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            try:
+                for frame_num, frame in enumerate(frames):
+                    pending.append(executor.submit(self.render, frame, frame_num))
+                    if len(pending) >= max_pending:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                # Consumer stopped early or a frame failed, drop queued work
+                for future in pending:
+                    future.cancel()
+
+    def draw_players(self, frame, frame_num):
+        tracks = self.tracks
+        rows = tracks.rows(frame_num, 'players')
+        for row in range(rows.start, rows.stop):
+            bbox = tracks.bbox[row].tolist()
+            color = tuple(tracks.team_color[row].tolist()) if tracks.team[row] != 0 else UNASSIGNED_TEAM_COLOR
+            draw_ellipse(frame, bbox, color, int(tracks.track_id[row]))
+            if tracks.has_ball[row]:
+                draw_triangle(frame, bbox, (0,0,255))
+
+    def draw_referees(self, frame, frame_num):
+        rows = self.tracks.rows(frame_num, 'referees')
+        for bbox in self.tracks.bbox[rows].tolist():
+            draw_ellipse(frame, bbox, (0,255,255))
+
+    def draw_ball(self, frame, frame_num):
+        rows = self.tracks.rows(frame_num, 'ball')
+        for bbox in self.tracks.bbox[rows].tolist():
+            draw_triangle(frame, bbox, (0,255,0))
+
+    def draw_ball_control(self, frame, frame_num):
+        team_1, team_2 = self.match_stats.get_possession(frame_num)
+        draw_ball_control_panel(frame, team_1, team_2)
+
+    def draw_camera_movement(self, frame, frame_num):
+        x_movement, y_movement = self.camera_movement_per_frame[frame_num]
+        draw_camera_movement_panel(frame, x_movement, y_movement)
+
+    def draw_speed_and_distance(self, frame, frame_num):
+        tracks = self.tracks
+        rows = tracks.rows(frame_num, 'players')
+        for row in range(rows.start, rows.stop):
+            if not np.isnan(tracks.speed[row]):
+                draw_speed_and_distance_text(frame, tracks.bbox[row].tolist(), float(tracks.speed[row]), float(tracks.distance[row]))
+
+    def get_team_colors(self):
+        # Colour of each team as drawn on the players, as CSS hex
+        tracks = self.tracks
+        team_colors = {0: bgr_to_hex(UNASSIGNED_TEAM_COLOR)}
+        for team in np.unique(tracks.team[tracks.class_mask('players')]):
+            if team != 0:
+                row = np.flatnonzero(tracks.class_mask('players') & (tracks.team == team))[0]
+                team_colors[int(team)] = bgr_to_hex(tracks.team_color[row])
+        return team_colors
+
+    def get_frame_overlay(self, frame_num):
+        # Everything render() would draw on a frame, as plain JSON-able values:
+        #   players            [track_id, x1, y1, x2, y2, team, has_ball]
+        #   referees, ball     [x1, y1, x2, y2]
+        #   ball_control       [team_1_share, team_2_share] up to this frame
+        #   camera_movement    [x, y]
+        #   speed_and_distance [foot_x, foot_y, km/h, metres]
+        # Rows without a finite box (e.g. the ball in a clip where it was never
+        # detected) are left out, JSON has no NaN.
+        tracks = self.tracks
+        overlay = {'frame': frame_num}
+        if 'players' in self.layers:
+            rows = self._finite_rows(frame_num, 'players')
+            overlay['players'] = [[track_id, *bbox, team, has_ball] for track_id, bbox, team, has_ball in zip(
+                tracks.track_id[rows].tolist(), np.round(tracks.bbox[rows].astype(np.float64), 1).tolist(),
+                tracks.team[rows].tolist(), tracks.has_ball[rows].tolist())]
+        for object_name in ('referees', 'ball'):
+            if object_name in self.layers:
+                overlay[object_name] = np.round(tracks.bbox[self._finite_rows(frame_num, object_name)].astype(np.float64), 1).tolist()
+        if 'ball_control' in self.layers:
+            overlay['ball_control'] = [round(float(share), 4) for share in self.match_stats.get_possession(frame_num)]
+        if 'camera_movement' in self.layers:
+            overlay['camera_movement'] = [round(float(v), 2) for v in self.camera_movement_per_frame[frame_num]]
+        if 'speed_and_distance' in self.layers:
+            rows = self._finite_rows(frame_num, 'players')
+            measured = rows[np.isfinite(tracks.speed[rows]) & np.isfinite(tracks.distance[rows])]
+            bboxes = tracks.bbox[measured].astype(np.float64)
+            # Same truncation as get_foot_position
+            foot_x = np.trunc((bboxes[:, 0] + bboxes[:, 2]) / 2).astype(int).tolist()
+            foot_y = np.trunc(bboxes[:, 3]).astype(int).tolist()
+            overlay['speed_and_distance'] = [list(values) for values in zip(
+                foot_x, foot_y, np.round(tracks.speed[measured], 2).tolist(), np.round(tracks.distance[measured], 2).tolist())]
+        return overlay
+
+    def _finite_rows(self, frame_num, object_name):
+        rows = self.tracks.rows(frame_num, object_name)
+        return np.flatnonzero(np.isfinite(self.tracks.bbox[rows]).all(axis=1)) + rows.start
+
+    def save_overlays(self, output_path, frame_size, fps):
+        # Writes the overlays as JSON lines instead of burning them into a
+        # video: a header line, then one line per frame. Clients draw them
+        # over the original video (see templates/index.html), a range of
+        # frames at a time through OverlaySidecarReader.
+        header = {
+            'version': OVERLAY_SIDECAR_VERSION,
+            'frame_size': [int(frame_size[0]), int(frame_size[1])],
+            'fps': float(fps),
+            'num_frames': int(self.tracks.num_frames),
+            'layers': self.layers,
+            'team_colors': self.get_team_colors(),
+        }
+        with atomic_write(output_path, 'w') as f:
+            # allow_nan=False: a NaN that slips through fails here, not in the browser
+            f.write(json.dumps(header, separators=(',', ':'), allow_nan=False) + '\n')
+            for frame_num in range(self.tracks.num_frames):
+                f.write(json.dumps(self.get_frame_overlay(frame_num), separators=(',', ':'), allow_nan=False) + '\n')
+        return output_path
+
+class OverlaySidecarReader():
+    # Random access to the frames of a sidecar written by save_overlays, so
+    # clients can fetch the overlays around the playback position instead of
+    # the whole file. The byte offset of every line is found with one scan
+    # when the reader is created.
+    def __init__(self, path, block_size=4 * 1024**2):
+        self.path = path
+        line_starts = [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+                line_starts.append(newlines.astype(np.int64) + offset + 1)
+                offset += len(block)
+        # Every line ends with a newline, the last start is the end of the file
+        self.line_starts = np.concatenate(line_starts)
+        self.num_frames = max(len(self.line_starts) - 2, 0)
+
+    def _read_lines(self, first_line, end_line):
+        with open(self.path, 'rb') as f:
+            f.seek(self.line_starts[first_line])
+            return f.read(self.line_starts[end_line] - self.line_starts[first_line])
+
+    def read_header(self):
+        return self._read_lines(0, 1)
+
+    def read_frames(self, start, count):
+        # Raw JSON lines of frames [start, start + count), clipped to the video
+        start = min(max(start, 0), self.num_frames)
+        end = min(start + max(count, 0), self.num_frames)
+        return self._read_lines(start + 1, end + 1)
@@ -1,9 +1,13 @@
+import functools
 import os
 import uuid
 import threading
 import time
 from flask import Flask, render_template, request, jsonify, send_from_directory, url_for
-from processor import process_video
+from processor import OUTPUT_MODES
+from annotation_renderer import OverlaySidecarReader
+from job_queue import JobQueue, QueueFullError
+from view_transformer import list_profiles, DEFAULT_CALIBRATION_DIR
 
 app = Flask(__name__)
 
@@ -12,6 +16,21 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 OUTPUT_FOLDER = os.path.join(BASE_DIR, 'output_videos')
 MODEL_PATH = os.path.join(BASE_DIR, 'models', 'best.pt')
+# Uploads can be full matches, so never hold the whole video in memory
+STREAMING = True
+# Frames decoded ahead of inference on a background thread
+PREFETCH_FRAMES = 64
+# 'pytorch', 'onnx' or 'openvino'; ONNX Runtime / OpenVINO are much faster on CPU-only nodes
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'pytorch')
+# Camera calibration profiles selectable per upload (created with calibrate.py)
+CALIBRATION_DIR = os.environ.get('CALIBRATION_DIR', DEFAULT_CALIBRATION_DIR)
+# Worker processes, each keeps its model loaded across jobs. Every worker
+# needs memory for one model and one video pass, size this to the machine.
+NUM_WORKERS = int(os.environ.get('NUM_WORKERS', 2))
+# Uploads waiting for a worker beyond this are rejected with 429
+MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 8))
+# Most frames of an overlay sidecar returned by one request
+MAX_OVERLAY_FRAMES = 1024
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -20,34 +39,48 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 
 # Global dictionary to store task status
-# Structure: task_id -> {'status': str, 'progress': int, 'message': str, 'output_file': str}
+# Structure: task_id -> {'status': str, 'progress': int, 'message': str, 'output_file': str,
+#                        'output_mode': str, 'source_file': str}
 tasks = {}
 
+# Output file of every task, reported once it has completed
+output_files = {}
+
 def update_task_progress(task_id, message, progress):
     tasks[task_id]['message'] = message
     tasks[task_id]['progress'] = progress
 
-def run_processing(task_id, input_path, output_filename):
-    try:
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        
-        # Define a callback to update progress
-        def progress_callback(step_name, percent):
-            update_task_progress(task_id, step_name, percent)
-            
-        # Run the processing
-        output_path, stats = process_video(input_path, output_path, MODEL_PATH, progress_callback)
-        
+def handle_job_event(task_id, event, payload):
+    # Called on the job queue's listener thread
+    if event == 'started':
+        tasks[task_id]['status'] = 'processing'
+        update_task_progress(task_id, 'Starting...', 0)
+    elif event == 'progress':
+        update_task_progress(task_id, *payload)
+    elif event == 'completed':
         tasks[task_id]['status'] = 'completed'
-        tasks[task_id]['output_file'] = output_filename
-        tasks[task_id]['stats'] = stats
+        tasks[task_id]['output_file'] = output_files.pop(task_id)
+        tasks[task_id]['stats'] = payload
         tasks[task_id]['progress'] = 100
         tasks[task_id]['message'] = "Processing complete!"
-        
-    except Exception as e:
+    elif event == 'failed':
+        output_files.pop(task_id, None)
         tasks[task_id]['status'] = 'failed'
-        tasks[task_id]['message'] = str(e)
-        print(f"Error processing video: {e}")
+        tasks[task_id]['message'] = payload
+
+job_queue = None
+job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    # Workers are started with the first upload, not on import
+    global job_queue
+    with job_queue_lock:
+        if job_queue is None:
+            job_queue = JobQueue(NUM_WORKERS, MAX_QUEUED_JOBS, MODEL_PATH, handle_job_event,
+                                 process_kwargs={'streaming': STREAMING, 'prefetch_frames': PREFETCH_FRAMES,
+                                                 'inference_backend': INFERENCE_BACKEND, 'calibration_dir': CALIBRATION_DIR})
+            job_queue.start()
+        return job_queue
 
 @app.route('/')
 def index():
@@ -62,6 +95,19 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
+    calibration_profile = request.form.get('calibration_profile') or None
+    if calibration_profile is not None and calibration_profile not in list_profiles(CALIBRATION_DIR):
+        return jsonify({'error': f'Unknown calibration profile: {calibration_profile}'}), 400
+    # 'overlay' returns a sidecar drawn over the original upload instead of a rendered video
+    output_mode = request.form.get('output_mode') or 'video'
+    if output_mode not in OUTPUT_MODES:
+        return jsonify({'error': f'Unknown output mode: {output_mode}'}), 400
+
+    # Reject before storing the upload when no more jobs can wait
+    jobs = get_job_queue()
+    if jobs.is_full():
+        return jsonify({'error': 'Too many videos are waiting to be processed, please try again later'}), 429
+
     if file:
         filename = file.filename
         unique_filename = f"{uuid.uuid4()}_{filename}"
@@ -70,24 +116,41 @@ def upload_file():
         
         task_id = str(uuid.uuid4())
         tasks[task_id] = {
-            'status': 'processing',
+            'status': 'queued',
             'progress': 0,
-            'message': 'Starting...',
-            'output_file': None
+            'message': 'Waiting for a worker...',
+            'output_file': None,
+            'output_mode': output_mode,
+            'source_file': unique_filename
         }
         
-        # Start processing in a background thread
-        # Force .mp4 extension for output
-        output_filename = f"processed_{uuid.uuid4()}_{os.path.splitext(filename)[0]}.mp4"
-        thread = threading.Thread(target=run_processing, args=(task_id, input_path, output_filename))
-        thread.start()
+        # Hand the job to the worker pool
+        # Force .mp4 extension for output, overlays are JSON lines
+        extension = '.jsonl' if output_mode == 'overlay' else '.mp4'
+        output_filename = f"processed_{uuid.uuid4()}_{os.path.splitext(filename)[0]}{extension}"
+        output_files[task_id] = output_filename
+        try:
+            jobs.submit(task_id, input_path, os.path.join(app.config['OUTPUT_FOLDER'], output_filename),
+                        calibration_profile=calibration_profile, output_mode=output_mode)
+        except QueueFullError:
+            # Another upload took the last place meanwhile
+            del tasks[task_id]
+            del output_files[task_id]
+            os.remove(input_path)
+            return jsonify({'error': 'Too many videos are waiting to be processed, please try again later'}), 429
         
         return jsonify({'task_id': task_id})
 
+@app.route('/calibration_profiles')
+def calibration_profiles():
+    return jsonify({'profiles': list_profiles(CALIBRATION_DIR)})
+
 @app.route('/status/<task_id>')
 def task_status(task_id):
     task = tasks.get(task_id)
     if task:
+        if task['status'] == 'queued' and job_queue is not None:
+            return jsonify(dict(task, queue_position=job_queue.queue_position(task_id)))
         return jsonify(task)
     return jsonify({'error': 'Task not found'}), 404
 
@@ -95,5 +158,27 @@ def task_status(task_id):
 def download_file(filename):
     return send_from_directory(app.config['OUTPUT_FOLDER'], filename)
 
+@functools.lru_cache(maxsize=16)
+def get_overlay_reader(path, mtime):
+    # mtime in the key: a rewritten sidecar gets a fresh line index
+    return OverlaySidecarReader(path)
+
+@app.route('/overlays/<filename>')
+def overlay_frames(filename):
+    # The sidecar header line followed by the lines of frames
+    # [start, start + count), so players only hold the frames near playback
+    path = os.path.join(app.config['OUTPUT_FOLDER'], os.path.basename(filename))
+    if not filename.endswith('.jsonl') or not os.path.isfile(path):
+        return jsonify({'error': 'Overlay not found'}), 404
+    start = request.args.get('start', 0, type=int)
+    count = min(request.args.get('count', MAX_OVERLAY_FRAMES, type=int), MAX_OVERLAY_FRAMES)
+    reader = get_overlay_reader(path, os.path.getmtime(path))
+    return app.response_class(reader.read_header() + reader.read_frames(start, count), mimetype='application/x-ndjson')
+
+@app.route('/uploads/<filename>')
+def uploaded_file(filename):
+    # The original video, played under the overlay sidecar
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
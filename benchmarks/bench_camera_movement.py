@@ -0,0 +1,122 @@
+# Camera movement estimation on long videos: the original per-feature Python
+# loop against the vectorized estimators. Frames are streamed, so the video
+# length is only bounded by time. Without --input a textured pitch is panned
+# along a known path, or zoomed in and out about its centre without any pan,
+# and the error against that ground truth is reported too.
+#
+#   python benchmarks/bench_camera_movement.py --frames 20000
+#   python benchmarks/bench_camera_movement.py --motion zoom
+#   python benchmarks/bench_camera_movement.py -i input_videos/clip.mp4
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from camera_movement_estimator import CameraMovementEstimator
+from utils import iter_video_frames, get_video_properties, measure_distance, measure_xy_distance
+
+class LegacyCameraMovementEstimator(CameraMovementEstimator):
+    # Previous implementation: Python loop over every tracked feature, status ignored
+    def update_frame_movement(self, frame):
+        frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        movement = np.zeros(2, dtype=np.float32)
+        if self.old_gray is None or self.old_features is None or len(self.old_features) == 0:
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+            self.old_gray = frame_gray
+            return movement
+        new_features, _, _ = cv2.calcOpticalFlowPyrLK(self.old_gray, frame_gray, self.old_features, None, **self.lk_params)
+
+        max_distance = 0
+        camera_movement_x, camera_movement_y = 0, 0
+        for new, old in zip(new_features, self.old_features):
+            new_features_point = new.ravel()
+            old_features_point = old.ravel()
+            distance = measure_distance(new_features_point, old_features_point)
+            if distance > max_distance:
+                max_distance = distance
+                camera_movement_x, camera_movement_y = measure_xy_distance(old_features_point, new_features_point)
+
+        if max_distance > self.minimum_distance:
+            movement = np.array([camera_movement_x, camera_movement_y], dtype=np.float32)
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray, **self.features)
+        self.old_gray = frame_gray
+        return movement
+
+def make_pitch(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    pitch = np.full((height, width, 3), (40, 120, 40), dtype=np.uint8)
+    noise = cv2.GaussianBlur(rng.integers(0, 60, (height, width), dtype=np.uint8), (0, 0), 3)
+    pitch[..., 1] += noise
+    for _ in range(400):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        cv2.circle(pitch, (x, y), int(rng.integers(2, 8)), (255, 255, 255), -1)
+    return pitch
+
+def synthetic_pan(num_frames, frame_size=(960, 540), seed=0):
+    # Smooth pan of a crop window over a larger pitch texture
+    width, height = frame_size
+    margin = 200
+    pitch = make_pitch(width + 2 * margin, height + 2 * margin, seed)
+    t = np.arange(num_frames)
+    offsets = np.stack([margin + 150 * np.sin(t / 20.0), margin + 60 * np.sin(t / 9.0)], axis=1)
+    offsets = np.round(offsets).astype(int)
+
+    def frames():
+        for x, y in offsets:
+            yield pitch[y:y + height, x:x + width]
+    # Camera movement is the pan relative to the first frame
+    return frames, (offsets - offsets[0]).astype(np.float32)
+
+def synthetic_zoom(num_frames, frame_size=(960, 540), seed=0):
+    # Zoom of up to about 2% per frame about the centre of the pitch texture,
+    # the camera does not move so the ground truth is zero everywhere
+    width, height = frame_size
+    margin = 200
+    pitch = make_pitch(width + 2 * margin, height + 2 * margin, seed)
+    t = np.arange(num_frames)
+    scales = 1.0 + 0.25 * np.sin(t / 12.0)
+
+    def frames():
+        for scale in scales:
+            matrix = cv2.getRotationMatrix2D((width / 2 + margin, height / 2 + margin), 0.0, scale)
+            matrix[:, 2] -= margin
+            yield cv2.warpAffine(pitch, matrix, (width, height), flags=cv2.INTER_LINEAR)
+    return frames, np.zeros((num_frames, 2), dtype=np.float32)
+
+def run(estimator, frames):
+    start = time.perf_counter()
+    movement = np.asarray(estimator.get_camera_movement(frames()), dtype=np.float32).reshape(-1, 2)
+    return movement, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark camera movement estimation.")
+    parser.add_argument('-i', '--input', type=str, default=None, help="Video file (default: synthetic pan)")
+    parser.add_argument('--frames', type=int, default=5000, help="Length of the synthetic video")
+    parser.add_argument('--motion', choices=('pan', 'zoom'), default='pan', help="Camera motion of the synthetic video")
+    args = parser.parse_args()
+
+    if args.input is not None:
+        first_frame, _, _ = get_video_properties(args.input)
+        frames = lambda: iter_video_frames(args.input)
+        ground_truth = None
+    else:
+        frames, ground_truth = (synthetic_pan if args.motion == 'pan' else synthetic_zoom)(args.frames)
+        first_frame = next(frames())
+
+    legacy, legacy_time = run(LegacyCameraMovementEstimator(first_frame), frames)
+    print(f"{'estimator':<12}{'time (s)':>10}{'frames/s':>10}{'speedup':>9}{'max |d| vs legacy':>19}{'gt error':>10}")
+
+    def report(name, movement, elapsed):
+        diff = np.abs(movement - legacy).max()
+        gt_error = '-' if ground_truth is None else f"{np.abs(movement - ground_truth).mean():.2f}"
+        print(f"{name:<12}{elapsed:>10.2f}{len(movement) / elapsed:>10.0f}{legacy_time / elapsed:>9.2f}{diff:>19.3f}{gt_error:>10}")
+
+    report('legacy', legacy, legacy_time)
+    for estimator in CameraMovementEstimator.ESTIMATORS:
+        movement, elapsed = run(CameraMovementEstimator(first_frame, estimator=estimator), frames)
+        report(estimator, movement, elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Chunk-parallel camera movement against the sequential estimator. Reports the
+# wall time per worker count and the largest deviation of the stitched
+# cumulative movement from the sequential result, failing above --tolerance.
+# Without --input the synthetic pan from bench_camera_movement.py is encoded
+# to a temporary video first, since workers decode their own frame ranges.
+#
+#   python benchmarks/bench_camera_movement_parallel.py -i input_videos/clip.mp4 --workers 2 4 8
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from camera_movement_estimator import CameraMovementEstimator
+from utils import iter_video_frames, get_video_properties, save_video
+from bench_camera_movement import synthetic_pan
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk-parallel camera movement estimation.")
+    parser.add_argument('-i', '--input', type=str, default=None, help="Video file (default: synthetic pan)")
+    parser.add_argument('--frames', type=int, default=3000, help="Length of the synthetic video")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--overlap', type=int, default=30)
+    parser.add_argument('--estimator', type=str, default='median', choices=CameraMovementEstimator.PARALLEL_ESTIMATORS)
+    parser.add_argument('--tolerance', type=float, default=1.0, help="Allowed max abs deviation in pixels")
+    args = parser.parse_args()
+
+    video_path = args.input
+    temp_dir = None
+    if video_path is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        video_path = os.path.join(temp_dir.name, 'pan.avi')
+        frames, _ = synthetic_pan(args.frames)
+        save_video(frames(), video_path)
+
+    try:
+        first_frame, _, _ = get_video_properties(video_path)
+        estimator = CameraMovementEstimator(first_frame, estimator=args.estimator)
+        start = time.perf_counter()
+        sequential = estimator.get_camera_movement(iter_video_frames(video_path))
+        sequential_time = time.perf_counter() - start
+        print(f"{'workers':<10}{'time (s)':>10}{'speedup':>9}{'max |d|':>10}{'result':>8}")
+        print(f"{'seq':<10}{sequential_time:>10.2f}{1.0:>9.2f}{0.0:>10.3f}{'-':>8}")
+
+        failed = False
+        for num_workers in args.workers:
+            start = time.perf_counter()
+            parallel = estimator.get_camera_movement_parallel(video_path, num_workers=num_workers,
+                                                              chunk_size=args.chunk_size, overlap=args.overlap)
+            elapsed = time.perf_counter() - start
+            if parallel.shape != sequential.shape:
+                deviation = np.inf
+            else:
+                deviation = float(np.abs(parallel - sequential).max()) if len(parallel) else 0.0
+            ok = deviation <= args.tolerance
+            failed |= not ok
+            print(f"{num_workers:<10}{elapsed:>10.2f}{sequential_time / elapsed:>9.2f}{deviation:>10.3f}{'ok' if ok else 'FAIL':>8}")
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Inference cost vs accuracy of strided detection with bbox interpolation.
+# Full-rate detection (stride 1) is the reference; for every other stride the
+# script reports detector calls, wall time and how well the interpolated
+# player/referee boxes match the reference (mean IoU and recall at IoU 0.5).
+#
+#   python benchmarks/bench_detection_stride.py -i input_videos/clip.mp4 --strides 2 3 4 --adaptive
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trackers import Tracker
+from utils import read_video
+
+def box_iou(boxes_a, boxes_b):
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / (area_a[:, None] + area_b[None, :] - intersection + 1e-9)
+
+def compare_tracks(reference, candidate):
+    # Track ids differ between runs, so match boxes by best IoU within each frame
+    ious = []
+    for frame_num in range(reference.num_frames):
+        for object_name in ('players', 'referees'):
+            reference_boxes = reference.bbox[reference.rows(frame_num, object_name)]
+            candidate_boxes = candidate.bbox[candidate.rows(frame_num, object_name)]
+            if len(reference_boxes) == 0:
+                continue
+            if len(candidate_boxes) == 0:
+                ious.extend([0.0] * len(reference_boxes))
+                continue
+            ious.extend(box_iou(reference_boxes, candidate_boxes).max(axis=1))
+    ious = np.asarray(ious)
+    return float(ious.mean()), float((ious >= 0.5).mean())
+
+def run(model_path, frames, **kwargs):
+    tracker = Tracker(model_path, **kwargs)
+    start = time.perf_counter()
+    tracks = tracker.get_object_tracks(frames)
+    return tracks, tracker.detection_count, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detection stride against full-rate detection.")
+    parser.add_argument('-i', '--input', type=str, required=True, help="Path to input video file")
+    parser.add_argument('-m', '--model', type=str, default=os.path.join('models', 'best.pt'))
+    parser.add_argument('--strides', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('--adaptive', action='store_true', help="Also benchmark adaptive stride for each stride")
+    args = parser.parse_args()
+
+    frames, _ = read_video(args.input)
+    reference, reference_calls, reference_time = run(args.model, frames)
+    print(f"{'mode':<18}{'detections':>12}{'time (s)':>10}{'speedup':>9}{'mean IoU':>10}{'recall@.5':>11}")
+    print(f"{'stride 1':<18}{reference_calls:>12}{reference_time:>10.2f}{1.0:>9.2f}{1.0:>10.3f}{1.0:>11.3f}")
+
+    modes = [(f"stride {stride}", dict(detection_stride=stride)) for stride in args.strides]
+    if args.adaptive:
+        modes += [(f"adaptive {stride}", dict(detection_stride=stride, adaptive_stride=True)) for stride in args.strides]
+    for name, kwargs in modes:
+        tracks, calls, elapsed = run(args.model, frames, **kwargs)
+        mean_iou, recall = compare_tracks(reference, tracks)
+        print(f"{name:<18}{calls:>12}{elapsed:>10.2f}{reference_time / elapsed:>9.2f}{mean_iou:>10.3f}{recall:>11.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Possession and player stats bookkeeping: the original per-frame slicing of
+# team_ball_control in draw_team_ball_control plus the end-of-job stats scan,
+# against the running MatchStats arrays. Every per-frame possession share and
+# the final per-team stats must match; the script exits non-zero otherwise.
+#
+#   python benchmarks/bench_match_stats.py --frames 5000 --players 22
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from utils import MatchStats
+from golden_speed_distance import make_tracks, to_store
+
+def legacy_possession(team_ball_control, frame_num):
+    team_ball_control_till_frame = team_ball_control[:frame_num+1]
+    team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
+    team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
+    total_frames = team_1_num_frames + team_2_num_frames
+    if total_frames == 0:
+        return 0.0, 0.0
+    return team_1_num_frames/total_frames, team_2_num_frames/total_frames
+
+def legacy_final_stats(tracks, team_ball_control):
+    stats = {}
+    total_frames_with_ball = float(np.sum(team_ball_control == 1) + np.sum(team_ball_control == 2))
+    is_player = tracks.class_mask('players')
+    speeds = np.nan_to_num(tracks.speed)
+    distances = np.nan_to_num(tracks.distance)
+    for team in (1, 2):
+        team_rows = is_player & (tracks.team == team)
+        player_ids, player_index = np.unique(tracks.track_id[team_rows], return_inverse=True)
+        player_distances = np.zeros(len(player_ids))
+        np.maximum.at(player_distances, player_index, distances[team_rows])
+        team_frames = float(np.sum(team_ball_control == team))
+        stats[team] = {
+            'possession': team_frames / total_frames_with_ball if total_frames_with_ball > 0 else 0,
+            'max_speed': float(speeds[team_rows].max(initial=0.0)),
+            'total_distance': float(player_distances.sum()),
+        }
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark running possession and player stats.")
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--players', type=int, default=22)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    tracks = to_store(make_tracks(args.frames, args.players))
+    SpeedAndDistance_Estimator().add_speed_and_distance_to_tracks(tracks)
+    # Teams are fixed per track, as both team assignment modes produce
+    track_teams = rng.integers(1, 3, tracks.track_id.max() + 1)
+    tracks.team[tracks.class_mask('players')] = track_teams[tracks.track_id[tracks.class_mask('players')]]
+    team_ball_control = np.where(rng.random(args.frames) < 0.1, 0, rng.integers(1, 3, args.frames))
+    team_ball_control[:int(rng.integers(0, 50))] = 0
+
+    start = time.perf_counter()
+    reference = [legacy_possession(team_ball_control, frame_num) for frame_num in range(args.frames)]
+    reference_final = legacy_final_stats(tracks, team_ball_control)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    match_stats = MatchStats(team_ball_control, tracks)
+    possession = [match_stats.get_possession(frame_num) for frame_num in range(args.frames)]
+    final = match_stats.get_final_stats()
+    running_time = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(reference, possession))
+    for team in (1, 2):
+        mismatches += reference_final[team]['possession'] != final[team]['possession']
+        mismatches += reference_final[team]['max_speed'] != final[team]['max_speed']
+        # Summed in a different order, equal up to rounding
+        mismatches += not np.isclose(reference_final[team]['total_distance'], final[team]['total_distance'], rtol=1e-12)
+    print(f"frames: {args.frames}, player rows: {int(tracks.class_mask('players').sum())}, mismatches: {mismatches}")
+    print(f"slicing: {legacy_time:.3f} s, running: {running_time:.4f} s ({legacy_time / running_time:.0f}x)")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
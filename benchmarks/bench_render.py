@@ -0,0 +1,138 @@
+# Output rendering: the original three passes (Tracker.draw_annotations,
+# draw_camera_movement and draw_speed_and_distance, each copying the frame and
+# blending panels through full-frame overlay copies) against the fused in-place
+# AnnotationRenderer. Reports frames/s and the peak bytes allocated per frame
+# (tracemalloc), and checks that both paths produce identical pixels.
+#
+#   python benchmarks/bench_render.py --frames 200 --players 22
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from annotation_renderer import AnnotationRenderer
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from utils import MatchStats, TrackStoreBuilder, draw_ellipse, draw_triangle, get_foot_position
+
+def make_tracks(num_frames, num_players, frame_size, seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    builder = TrackStoreBuilder()
+    start = rng.uniform((0, 0), (width - 80, height - 160), (num_players, 2))
+    for frame_num in range(num_frames):
+        xy = np.clip(start + rng.normal(0, 2, start.shape) * frame_num ** 0.5, 0, (width - 80, height - 160))
+        size = rng.uniform((30, 70), (60, 140), (num_players, 2))
+        builder.add(frame_num, 'players', np.arange(1, num_players + 1), np.hstack([xy, xy + size]))
+        builder.add(frame_num, 'referees', [200], [[width / 2, height / 2, width / 2 + 40, height / 2 + 100]])
+        if rng.random() < 0.9:
+            ball = rng.uniform((0, 0), (width - 20, height - 20))
+            builder.add(frame_num, 'ball', [1], [np.r_[ball, ball + 16]])
+    tracks = builder.build(num_frames)
+    players = tracks.class_mask('players')
+    tracks.position_adjusted[players] = 0.0
+    tracks.position_transformed[players] = rng.uniform(0, 20, (players.sum(), 2)).cumsum(axis=0) % 60
+    SpeedAndDistance_Estimator().add_speed_and_distance_to_tracks(tracks)
+    tracks.team[players] = tracks.track_id[players] % 2 + 1
+    tracks.team_color[players] = np.where((tracks.team[players] == 1)[:, None], (200, 40, 40), (230, 230, 230))
+    tracks.has_ball[np.flatnonzero(players)[::17]] = True
+    team_ball_control = rng.integers(0, 3, num_frames)
+    camera_movement = rng.normal(0, 3, (num_frames, 2)).cumsum(axis=0).astype(np.float32)
+    return tracks, team_ball_control, camera_movement
+
+def legacy_render(frame, frame_num, tracks_view, team_ball_control, camera_movement_per_frame):
+    # Tracker.draw_annotations
+    frame = frame.copy()
+    for track_id, player in tracks_view["players"][frame_num].items():
+        draw_ellipse(frame, player["bbox"], player.get("team_color",(0,0,255)), track_id)
+        if player.get('has_ball',False):
+            draw_triangle(frame, player["bbox"],(0,0,255))
+    for _, referee in tracks_view["referees"][frame_num].items():
+        draw_ellipse(frame, referee["bbox"],(0,255,255))
+    for _, ball in tracks_view["ball"][frame_num].items():
+        draw_triangle(frame, ball["bbox"],(0,255,0))
+
+    frame_h, frame_w = frame.shape[:2]
+    overlay_w, overlay_h = max(int(frame_w * 0.35), 300), max(int(frame_h * 0.15), 100)
+    x2, y2 = frame_w - 20, frame_h - 20
+    x1, y1 = x2 - overlay_w, y2 - overlay_h
+    overlay = frame.copy()
+    cv2.rectangle(overlay, (x1, y1), (x2, y2), (255,255,255), -1 )
+    cv2.addWeighted(overlay, 0.4, frame, 0.6, 0, frame)
+    team_ball_control_till_frame = team_ball_control[:frame_num+1]
+    team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
+    team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
+    total_frames = team_1_num_frames + team_2_num_frames
+    team_1 = team_1_num_frames/total_frames if total_frames else 0.0
+    team_2 = team_2_num_frames/total_frames if total_frames else 0.0
+    font_scale = max(frame_w / 2000, 0.6)
+    text_x = x1 + int(overlay_w * 0.1)
+    cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(text_x, y1 + int(overlay_h * 0.4)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
+    cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(text_x, y1 + int(overlay_h * 0.8)), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
+
+    # CameraMovementEstimator.draw_camera_movement
+    frame = frame.copy()
+    overlay = frame.copy()
+    cv2.rectangle(overlay,(0,0),(500,100),(255,255,255),-1)
+    cv2.addWeighted(overlay,0.6,frame,0.4,0,frame)
+    x_movement, y_movement = camera_movement_per_frame[frame_num]
+    cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+    cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+
+    # SpeedAndDistance_Estimator.draw_speed_and_distance
+    for _, track_info in tracks_view["players"][frame_num].items():
+        if "speed" in track_info:
+            position = get_foot_position(track_info['bbox'])
+            position = (int(position[0]), int(position[1] + 40))
+            cv2.putText(frame, f"{track_info['speed']:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+            cv2.putText(frame, f"{track_info['distance']:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+    return frame
+
+def measure(render, base_frame, num_frames):
+    render_time = 0.0
+    peak_bytes = 0
+    outputs = []
+    tracemalloc.start()
+    for frame_num in range(num_frames):
+        frame = base_frame.copy()
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        frame = render(frame, frame_num)
+        render_time += time.perf_counter() - start
+        peak_bytes += tracemalloc.get_traced_memory()[1] - start_bytes
+        # Keep a few frames for the pixel comparison
+        if frame_num % max(1, num_frames // 10) == 0:
+            outputs.append(frame)
+    tracemalloc.stop()
+    return num_frames / render_time, peak_bytes / num_frames, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused in-place rendering against the three-pass path.")
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--players', type=int, default=22)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    tracks, team_ball_control, camera_movement = make_tracks(args.frames, args.players, (args.width, args.height))
+    base_frame = np.random.default_rng(1).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    tracks_view = tracks.as_dict()
+    renderer = AnnotationRenderer(tracks, MatchStats(team_ball_control, tracks), camera_movement)
+
+    legacy_fps, legacy_bytes, legacy_frames = measure(
+        lambda frame, frame_num: legacy_render(frame, frame_num, tracks_view, team_ball_control, camera_movement), base_frame, args.frames)
+    fused_fps, fused_bytes, fused_frames = measure(renderer.render, base_frame, args.frames)
+    same = all(np.array_equal(a, b) for a, b in zip(legacy_frames, fused_frames))
+
+    print(f"{'path':<12}{'frames/s':>10}{'KiB/frame':>12}")
+    print(f"{'three-pass':<12}{legacy_fps:>10.1f}{legacy_bytes / 1024:>12.1f}")
+    print(f"{'fused':<12}{fused_fps:>10.1f}{fused_bytes / 1024:>12.1f}")
+    print(f"identical pixels: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
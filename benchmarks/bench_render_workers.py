@@ -0,0 +1,67 @@
+# Ordered parallel rendering: AnnotationRenderer.render_frames at several
+# worker counts, feeding a real video writer (FFmpeg when installed, OpenCV
+# otherwise) so rendering overlaps with encoding. Also times the writer alone
+# to show the encoder's ceiling. Frames must reach the writer in order and
+# identical to the single-threaded render.
+#
+#   python benchmarks/bench_render_workers.py --workers 1 2 4 8 --frames 300
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from annotation_renderer import AnnotationRenderer
+from utils import MatchStats, open_video_writer
+from bench_render import make_tracks
+
+def source_frames(base_frames, num_frames):
+    for frame_num in range(num_frames):
+        yield base_frames[frame_num % len(base_frames)].copy()
+
+def write_frames(frames, output_path, fps, frame_size, backend):
+    writer = open_video_writer(output_path, fps, frame_size, backend=backend)
+    digest = hashlib.sha1()
+    start = time.perf_counter()
+    try:
+        for frame in frames:
+            digest.update(frame.data)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return time.perf_counter() - start, digest.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel ordered rendering into the video writer.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--players', type=int, default=22)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--backend', type=str, default='ffmpeg', choices=['ffmpeg', 'opencv'])
+    args = parser.parse_args()
+
+    frame_size = (args.width, args.height)
+    tracks, team_ball_control, camera_movement = make_tracks(args.frames, args.players, frame_size)
+    renderer = AnnotationRenderer(tracks, MatchStats(team_ball_control, tracks), camera_movement)
+    rng = np.random.default_rng(1)
+    base_frames = [rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+
+    print(f"cpu count: {os.cpu_count()}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, 'render.mp4')
+        encode_time, _ = write_frames(source_frames(base_frames, args.frames), output_path, 24, frame_size, args.backend)
+        print(f"{'writer only':<14}{args.frames / encode_time:>10.1f} frames/s")
+        print(f"{'workers':<14}{'frames/s':>10}{'speedup':>9}{'same':>6}")
+        baseline = reference = None
+        for num_workers in args.workers:
+            frames = renderer.render_frames(source_frames(base_frames, args.frames), num_workers=num_workers)
+            elapsed, digest = write_frames(frames, output_path, 24, frame_size, args.backend)
+            if baseline is None:
+                baseline, reference = elapsed, digest
+            print(f"{num_workers:<14}{args.frames / elapsed:>10.1f}{baseline / elapsed:>9.2f}{str(digest == reference):>6}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Jersey colour extraction: one sklearn KMeans per player crop (the original
+# get_player_color) against the batched NumPy 2-means of get_player_colors.
+# Synthetic players wear one of two kit colours on a noisy pitch background;
+# the script reports time per frame and the distance of each path's colours
+# to the true kit colour.
+#
+#   python benchmarks/bench_team_colors.py --frames 20 --players 22
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from team_assigner import TeamAssigner
+
+KIT_COLORS = np.array([[40, 40, 200], [230, 230, 230]], dtype=np.float64)
+
+def make_frame(num_players, rng, size=(1080, 1920)):
+    frame = np.clip(rng.normal((40, 130, 40), 12, size + (3,)), 0, 255).astype(np.uint8)
+    bboxes, teams = [], []
+    for _ in range(num_players):
+        width, height = int(rng.integers(25, 60)), int(rng.integers(60, 140))
+        x1, y1 = int(rng.integers(0, size[1] - width)), int(rng.integers(0, size[0] - height))
+        team = int(rng.integers(0, 2))
+        # Shirt in the middle of the box, shorts below, pitch around it
+        shirt = np.clip(rng.normal(KIT_COLORS[team], 10, (height // 2 - height // 8, width // 2, 3)), 0, 255)
+        frame[y1 + height // 8:y1 + height // 2, x1 + width // 4:x1 + width // 4 + width // 2] = shirt.astype(np.uint8)
+        frame[y1 + height // 2:y1 + 3 * height // 4, x1 + width // 4:x1 + 3 * width // 4] = 20
+        bboxes.append([x1, y1, x1 + width, y1 + height])
+        teams.append(team)
+    return frame, np.array(bboxes, dtype=np.float32), np.array(teams)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched team colour extraction.")
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--players', type=int, default=22)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    team_assigner = TeamAssigner()
+    per_player_time = batched_time = 0.0
+    per_player_error, batched_error = [], []
+    for _ in range(args.frames):
+        frame, bboxes, teams = make_frame(args.players, rng)
+
+        start = time.perf_counter()
+        per_player = np.array([team_assigner.get_player_color(frame, bbox) for bbox in bboxes])
+        per_player_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = team_assigner.get_player_colors(frame, bboxes)
+        batched_time += time.perf_counter() - start
+
+        per_player_error.extend(np.linalg.norm(per_player - KIT_COLORS[teams], axis=1))
+        batched_error.extend(np.linalg.norm(batched - KIT_COLORS[teams], axis=1))
+
+    print(f"{'path':<12}{'ms/frame':>10}{'speedup':>9}{'median colour error':>21}")
+    print(f"{'per-player':<12}{per_player_time / args.frames * 1000:>10.1f}{1.0:>9.1f}{np.median(per_player_error):>21.1f}")
+    print(f"{'batched':<12}{batched_time / args.frames * 1000:>10.1f}{per_player_time / batched_time:>9.1f}{np.median(batched_error):>21.1f}")
+
+if __name__ == '__main__':
+    main()
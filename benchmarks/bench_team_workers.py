@@ -0,0 +1,127 @@
+# Thread-pool scaling of the per-player crop and colour work in TeamAssigner.
+# Stages:
+#   frame colours   get_player_colors per frame
+#   sampled colours get_crop_colors on one large batch of crops, as in the vote pass
+#   sklearn         the original per-player get_player_color, one task per player
+#   first sight     assign_first_sight_teams, the whole first_frame team pass
+#   vote sampling   sample_track_crops, the crop sampling of the vote team pass
+# Results at every worker count must equal the single-threaded ones, and the
+# first sight teams must equal the original per-frame get_player_teams loop.
+#
+#   python benchmarks/bench_team_workers.py --workers 1 4 8 16
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from team_assigner import TeamAssigner
+from utils import TrackStoreBuilder
+from bench_team_colors import make_frame
+
+STAGES = ('frame colours', 'sampled colours', 'sklearn', 'first sight', 'vote sampling')
+
+def make_tracks(frames, new_per_frame=3):
+    # Track ids churn by new_per_frame every frame, a few boxes are too small to crop
+    builder = TrackStoreBuilder()
+    for frame_num, (_, bboxes) in enumerate(frames):
+        bboxes = bboxes.copy()
+        bboxes[frame_num % len(bboxes), 3] = bboxes[frame_num % len(bboxes), 1] + 1
+        builder.add(frame_num, 'players', np.arange(len(bboxes)) + frame_num * new_per_frame, bboxes)
+    return builder.build(len(frames))
+
+def serial_first_sight_teams(frames, tracks, kmeans):
+    # The original first_frame team pass, one get_player_teams call per frame
+    team_assigner = TeamAssigner()
+    team_assigner.kmeans = kmeans
+    teams = []
+    for frame_num, (frame, _) in enumerate(frames):
+        rows = tracks.rows(frame_num, 'players')
+        teams.append(team_assigner.get_player_teams(frame, tracks.bbox[rows], tracks.track_id[rows].tolist()))
+    return np.concatenate(teams)
+
+def fit_team_model(frames, tracks):
+    # Fitted once and shared, k-means++ seeding may swap the team labels between fits
+    team_assigner = TeamAssigner()
+    rows = tracks.rows(0, 'players')
+    team_assigner.assign_team_color(frames[0][0], {int(track_id): {'bbox': bbox} for track_id, bbox in
+                                                    zip(tracks.track_id[rows], tracks.bbox[rows])})
+    return team_assigner.kmeans
+
+def run_stages(team_assigner, frames, crops, sklearn_frames, tracks, kmeans):
+    timings, results = {}, {}
+
+    start = time.perf_counter()
+    results['frame colours'] = np.concatenate([team_assigner.get_player_colors(frame, bboxes) for frame, bboxes in frames])
+    timings['frame colours'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results['sampled colours'] = team_assigner.get_crop_colors(crops)
+    timings['sampled colours'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    colors = []
+    for frame, bboxes in sklearn_frames:
+        if team_assigner.executor is None:
+            colors.extend(team_assigner.get_player_color(frame, bbox) for bbox in bboxes)
+        else:
+            colors.extend(team_assigner.executor.map(lambda bbox: team_assigner.get_player_color(frame, bbox), bboxes))
+    results['sklearn'] = np.array(colors)
+    timings['sklearn'] = time.perf_counter() - start
+
+    first_sight_assigner = TeamAssigner(num_workers=team_assigner.num_workers)
+    first_sight_assigner.kmeans = kmeans
+    start = time.perf_counter()
+    results['first sight'] = first_sight_assigner.assign_first_sight_teams((frame for frame, _ in frames), tracks)
+    timings['first sight'] = time.perf_counter() - start
+    first_sight_assigner.close()
+
+    start = time.perf_counter()
+    _, samples, filled = team_assigner.sample_track_crops((frame for frame, _ in frames), tracks)
+    results['vote sampling'] = np.where(filled[..., None, None, None], samples, 0)
+    timings['vote sampling'] = time.perf_counter() - start
+    return timings, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thread-pool crop and colour work.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--players', type=int, default=22)
+    parser.add_argument('--crops', type=int, default=20000, help="Crops in the sampled-colours batch")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(args.frames):
+        frame, bboxes, _ = make_frame(args.players, rng)
+        frames.append((frame, bboxes))
+    crop_pool = [crop for frame, bboxes in frames for crop in TeamAssigner().get_player_crops(frame, bboxes) if crop is not None]
+    crops = np.stack([crop_pool[i] for i in rng.integers(0, len(crop_pool), args.crops)])
+    # sklearn fits are slow, a few frames are enough to see the scaling
+    sklearn_frames = frames[:3]
+
+    tracks = make_tracks(frames)
+    kmeans = fit_team_model(frames, tracks)
+    serial_teams = serial_first_sight_teams(frames, tracks, kmeans)
+
+    print(f"cpu count: {os.cpu_count()}")
+    print(f"{'workers':<9}" + ''.join(f"{stage + ' (s)':>20}{'speedup':>9}" for stage in STAGES) + f"{'same':>6}")
+    baseline = reference = None
+    failed = False
+    for num_workers in args.workers:
+        team_assigner = TeamAssigner(num_workers=num_workers)
+        timings, results = run_stages(team_assigner, frames, crops, sklearn_frames, tracks, kmeans)
+        team_assigner.close()
+        if baseline is None:
+            baseline, reference = timings, results
+        # The sklearn stage uses random k-means++ seeding, so only the batched stages must match exactly
+        same = all(np.array_equal(results[stage], reference[stage], equal_nan=True)
+                   for stage in ('frame colours', 'sampled colours', 'vote sampling'))
+        same &= np.array_equal(results['first sight'], serial_teams)
+        failed |= not same
+        print(f"{num_workers:<9}" + ''.join(f"{timings[stage]:>20.3f}{baseline[stage] / timings[stage]:>9.2f}" for stage in STAGES) + f"{str(same):>6}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
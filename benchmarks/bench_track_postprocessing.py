@@ -0,0 +1,104 @@
+# Microbenchmark for turning per-frame YOLO detections into tracks:
+# the original per-row Python loop vs the vectorized masks in Tracker.
+# ByteTrack is left out so only the post-processing is measured.
+#
+#   python benchmarks/bench_track_postprocessing.py --frames 20000 --objects 25
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import supervision as sv
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from trackers import Tracker
+from utils import TrackStoreBuilder
+
+CLASS_NAMES = {0: 'ball', 1: 'goalkeeper', 2: 'player', 3: 'referee'}
+
+def make_detections(num_frames, num_objects, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(num_frames):
+        xy = rng.random((num_objects, 2)) * [1800, 1000]
+        xyxy = np.hstack([xy, xy + [40, 80]]).astype(np.float32)
+        class_id = rng.choice([0, 1, 2, 2, 2, 2, 2, 2, 3], size=num_objects)
+        detections = sv.Detections(
+            xyxy=xyxy,
+            confidence=rng.random(num_objects).astype(np.float32),
+            class_id=class_id,
+            tracker_id=np.arange(1, num_objects + 1),
+        )
+        frames.append(detections)
+    return frames
+
+def legacy_postprocess(frames):
+    tracks = {"players": [], "referees": [], "ball": []}
+    for frame_num, detection_supervision in enumerate(frames):
+        cls_names = CLASS_NAMES
+        cls_names_inv = {v: k for k, v in cls_names.items()}
+        class_id = detection_supervision.class_id.copy()
+        for object_ind, cls_id in enumerate(class_id):
+            if cls_names[cls_id] == "goalkeeper":
+                class_id[object_ind] = cls_names_inv["player"]
+        detection_with_tracks = sv.Detections(xyxy=detection_supervision.xyxy, confidence=detection_supervision.confidence,
+                                              class_id=class_id, tracker_id=detection_supervision.tracker_id)
+
+        tracks["players"].append({})
+        tracks["referees"].append({})
+        tracks["ball"].append({})
+
+        for frame_detection in detection_with_tracks:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            track_id = frame_detection[4]
+            if cls_id == cls_names_inv['player']:
+                tracks["players"][frame_num][track_id] = {"bbox": bbox}
+            if cls_id == cls_names_inv['referee']:
+                tracks["referees"][frame_num][track_id] = {"bbox": bbox}
+
+        for frame_detection in detection_with_tracks:
+            bbox = frame_detection[0].tolist()
+            cls_id = frame_detection[3]
+            if cls_id == cls_names_inv['ball']:
+                tracks["ball"][frame_num][1] = {"bbox": bbox}
+    return tracks
+
+def vectorized_postprocess(frames):
+    builder = TrackStoreBuilder()
+    class_ids = Tracker.get_class_ids(CLASS_NAMES)
+    for frame_num, detection_supervision in enumerate(frames):
+        class_id = detection_supervision.class_id.copy()
+        class_id[class_id == class_ids['goalkeeper']] = class_ids['player']
+        detection_with_tracks = sv.Detections(xyxy=detection_supervision.xyxy, confidence=detection_supervision.confidence,
+                                              class_id=class_id, tracker_id=detection_supervision.tracker_id)
+        for object_name, (track_ids, bboxes) in Tracker.split_detections(detection_with_tracks, detection_with_tracks, class_ids).items():
+            builder.add(frame_num, object_name, track_ids, bboxes)
+    return builder.build(len(frames))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark YOLO result post-processing.")
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--objects', type=int, default=25)
+    args = parser.parse_args()
+
+    frames = make_detections(args.frames, args.objects)
+
+    start = time.perf_counter()
+    legacy_tracks = legacy_postprocess(frames)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = vectorized_postprocess(frames)
+    vectorized_time = time.perf_counter() - start
+
+    legacy_players = sum(len(frame) for frame in legacy_tracks["players"])
+    store_players = int(store.class_mask('players').sum())
+    assert legacy_players == store_players, (legacy_players, store_players)
+
+    print(f"Frames: {args.frames}, objects per frame: {args.objects}")
+    print(f"Per-row loop:  {legacy_time:.3f}s ({args.frames / legacy_time:.0f} frames/s)")
+    print(f"Vectorized:    {vectorized_time:.3f}s ({args.frames / vectorized_time:.0f} frames/s)")
+    print(f"Speedup:       {legacy_time / vectorized_time:.1f}x")
+
+if __name__ == '__main__':
+    main()
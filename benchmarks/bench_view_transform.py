@@ -0,0 +1,43 @@
+# Per-point ViewTransformer.transform_point against the batch transform_points
+# on a full match worth of synthetic positions (default: 90 minutes at 25 fps
+# with 23 tracked objects, subsampled for the per-point loop).
+#
+#   python benchmarks/bench_view_transform.py --points 3105000
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from view_transformer import ViewTransformer
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch perspective transform.")
+    parser.add_argument('--points', type=int, default=90 * 60 * 25 * 23)
+    parser.add_argument('--loop-points', type=int, default=100000, help="Points timed with the per-point loop")
+    args = parser.parse_args()
+
+    width, height = 1920, 1080
+    view_transformer = ViewTransformer(frame_width=width, frame_height=height)
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(0, width, args.points), rng.uniform(0, height, args.points)]).astype(np.float32)
+
+    loop_points = points[:args.loop_points]
+    start = time.perf_counter()
+    legacy = [view_transformer.transform_point(point) for point in loop_points]
+    loop_time = (time.perf_counter() - start) * args.points / len(loop_points)
+
+    start = time.perf_counter()
+    transformed = view_transformer.transform_points(points)
+    batch_time = time.perf_counter() - start
+
+    legacy = np.array([np.full(2, np.nan) if p is None else p.reshape(2) for p in legacy])
+    same_inside = np.array_equal(np.isnan(legacy), np.isnan(transformed[:len(loop_points)]))
+    max_diff = np.nanmax(np.abs(legacy - transformed[:len(loop_points)]))
+    print(f"points: {args.points}, inside pitch: {int((~np.isnan(transformed[:, 0])).sum())}")
+    print(f"per-point loop (extrapolated): {loop_time:.2f} s")
+    print(f"batch:                         {batch_time:.3f} s ({loop_time / batch_time:.0f}x)")
+    print(f"same inside mask: {same_inside}, max abs diff: {max_diff:.2e}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Golden comparison of the batched ball possession assignment against the
+# original per-frame loop over assign_ball_to_player. Synthetic frames have
+# a varying number of players, frames without a ball and balls far from
+# every player. Possession flags and the team-in-possession array must match
+# exactly; the script exits non-zero otherwise and reports both timings.
+#
+#   python benchmarks/golden_ball_assignment.py --frames 5000 --players 22
+import argparse
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from player_ball_assigner import PlayerBallAssigner
+from utils import TrackStore, TrackStoreBuilder
+
+def make_store(num_frames, num_players, seed=0):
+    rng = np.random.default_rng(seed)
+    builder = TrackStoreBuilder()
+    for frame_num in range(num_frames):
+        count = int(rng.integers(0, num_players + 1))
+        track_ids = rng.choice(np.arange(1, num_players * 2), count, replace=False)
+        xy = rng.uniform(0, 1000, (count, 2))
+        size = rng.uniform((20, 50), (60, 140), (count, 2))
+        builder.add(frame_num, 'players', track_ids, np.hstack([xy, xy + size]))
+        if rng.random() < 0.8:
+            # Mostly near a player's feet, sometimes anywhere on the frame
+            centre = rng.uniform(0, 1100, 2)
+            if count and rng.random() < 0.7:
+                centre = np.array([xy[0, 0], xy[0, 1] + size[0, 1]]) + rng.normal(0, 40, 2)
+            builder.add(frame_num, 'ball', [1], [np.r_[centre - 8, centre + 8]])
+    store = builder.build(num_frames)
+    players = store.class_mask('players')
+    store.team[players] = rng.integers(1, 3, players.sum())
+    return store
+
+def legacy_possession(player_assigner, tracks):
+    tracks_view = tracks.as_dict()
+    team_ball_control = []
+    for frame_num, player_track in enumerate(tracks_view['players']):
+        ball_row = tracks.find_row(frame_num, 'ball', 1)
+        assigned_player = -1
+        if ball_row != -1:
+            assigned_player = player_assigner.assign_ball_to_player(player_track, tracks.bbox[ball_row].tolist())
+        if assigned_player != -1:
+            player_row = tracks.find_row(frame_num, 'players', assigned_player)
+            tracks.has_ball[player_row] = True
+            team_ball_control.append(int(tracks.team[player_row]))
+        else:
+            team_ball_control.append(team_ball_control[-1] if team_ball_control else 0)
+    return np.array(team_ball_control)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batched ball assignment with the per-frame loop.")
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--players', type=int, default=22)
+    args = parser.parse_args()
+
+    reference = make_store(args.frames, args.players)
+    store = TrackStore.from_arrays(reference.to_arrays())
+    player_assigner = PlayerBallAssigner()
+
+    start = time.perf_counter()
+    reference_control = legacy_possession(player_assigner, reference)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    team_ball_control = player_assigner.assign_ball_possession(store)
+    batched_time = time.perf_counter() - start
+
+    mismatches = int(np.sum(reference.has_ball != store.has_ball) + np.sum(reference_control != team_ball_control))
+    print(f"frames: {args.frames}, possessions: {int(reference.has_ball.sum())}, mismatches: {mismatches}")
+    print(f"loop: {loop_time:.3f} s, batched: {batched_time:.4f} s ({loop_time / batched_time:.0f}x)")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Golden comparison of the vectorized TrackStore speed/distance computation
+# against the original dict implementation. Synthetic player tracks come with
+# gaps, tracks entering and leaving, missing and None transformed positions.
+# Every speed must match exactly and every distance to within --atol metres
+# (the running distances come from one cumsum over all tracks, so the last
+# bits differ from per-track sums); the script exits non-zero otherwise and also
+# reports the time taken by both implementations.
+#
+#   python benchmarks/golden_speed_distance.py --frames 5000 --players 22
+import argparse
+import copy
+import os
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from utils import TrackStore, OBJECT_CLASSES
+
+def make_tracks(num_frames, num_players, seed=0):
+    rng = np.random.default_rng(seed)
+    tracks = {object_name: [{} for _ in range(num_frames)] for object_name in OBJECT_CLASSES}
+    for track_id in range(1, num_players * 3):
+        # Tracks live for a random span and miss random frames
+        first = int(rng.integers(0, num_frames))
+        last = min(num_frames, first + int(rng.integers(1, num_frames)))
+        position = rng.uniform(0, 60, 2)
+        for frame_num in range(first, last):
+            position = position + rng.normal(0, 0.2, 2)
+            if rng.random() < 0.05:
+                continue
+            track_info = {'bbox': [0.0, 0.0, 10.0, 20.0]}
+            roll = rng.random()
+            if roll < 0.05:
+                track_info['position_adjusted'] = (0.0, 0.0)
+                track_info['position_transformed'] = None
+            elif roll > 0.02 + 0.05:
+                track_info['position_adjusted'] = (0.0, 0.0)
+                track_info['position_transformed'] = np.float32(position).tolist()
+            tracks['players'][frame_num][track_id] = track_info
+    return tracks
+
+def to_store(tracks):
+    store = TrackStore.from_dict(tracks)
+    for row in range(len(store)):
+        object_name = OBJECT_CLASSES[store.object_class[row]]
+        track_info = tracks[object_name][store.frame[row]][int(store.track_id[row])]
+        if track_info.get('position_transformed') is not None:
+            store.position_transformed[row] = track_info['position_transformed']
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vectorized speed/distance with the dict implementation.")
+    parser.add_argument('--frames', type=int, default=3000)
+    parser.add_argument('--players', type=int, default=22)
+    parser.add_argument('--fps', type=float, default=24)
+    parser.add_argument('--frame-window', type=int, default=5)
+    parser.add_argument('--atol', type=float, default=1e-6, help="Allowed distance error in metres")
+    args = parser.parse_args()
+
+    tracks = make_tracks(args.frames, args.players)
+    store = to_store(tracks)
+    reference = copy.deepcopy(tracks)
+    estimator = SpeedAndDistance_Estimator(fps=args.fps, frame_window=args.frame_window)
+
+    start = time.perf_counter()
+    estimator.add_speed_and_distance_to_tracks(reference)
+    dict_time = time.perf_counter() - start
+    start = time.perf_counter()
+    estimator.add_speed_and_distance_to_tracks(store)
+    store_time = time.perf_counter() - start
+
+    mismatches = 0
+    measured = 0
+    for row in range(len(store)):
+        track_info = reference['players'][store.frame[row]][int(store.track_id[row])]
+        if 'speed' not in track_info:
+            mismatches += not np.isnan(store.speed[row])
+            continue
+        measured += 1
+        mismatches += track_info['speed'] != store.speed[row] or abs(store.distance[row] - track_info['distance']) > args.atol
+
+    print(f"rows: {len(store)}, with speed: {measured}, mismatches: {mismatches}")
+    print(f"dict: {dict_time:.3f} s, vectorized: {store_time:.4f} s ({dict_time / store_time:.0f}x)")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Check of the cached 'vote' team model path. The same synthetic upload is
+# run three times through a fresh ResultCache: the first run fits and saves
+# the model, the next two load it. Every run must give the same team for
+# every player row. Covered: clips whose crops are too small to fit a model
+# (the all-team-1 fallback), tracks missing from the cached model and a
+# cached model without any tracks. Exits non-zero on a mismatch.
+#
+#   python benchmarks/golden_team_model_cache.py
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from team_assigner import TeamAssigner
+from utils import ResultCache, TrackStoreBuilder
+
+def make_tracks(num_frames, track_ids, box_size, seed=0):
+    rng = np.random.default_rng(seed)
+    builder = TrackStoreBuilder()
+    for frame_num in range(num_frames):
+        corners = rng.uniform(0, 200, (len(track_ids), 2))
+        bboxes = np.hstack([corners, corners + box_size])
+        builder.add(frame_num, 'players', track_ids, bboxes)
+    return builder.build(num_frames)
+
+def make_frames(num_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (240, 320, 3), dtype=np.uint8) for _ in range(num_frames)]
+
+def assign_teams(cache, frames, tracks):
+    # Same steps as the 'vote' branch of process_video
+    team_assigner = TeamAssigner()
+    team_key = ResultCache.make_key('team_model', tracks='check', crop_size=team_assigner.crop_size)
+    team_model = cache.load(team_key, required=('team_colors', 'track_ids', 'teams'))
+    if team_model is not None:
+        track_ids, teams = team_assigner.load_team_model(team_model)
+    else:
+        track_ids, teams = team_assigner.fit_track_teams(frames, tracks)
+        cache.save(team_key, team_assigner.get_team_model())
+    player_rows = np.flatnonzero(tracks.class_mask('players'))
+    return TeamAssigner.lookup_track_teams(track_ids, teams, tracks.track_id[player_rows])
+
+def check(name, frames, tracks, unseen_tracks=None):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResultCache(cache_dir)
+        runs = [assign_teams(cache, frames, tracks) for _ in range(3)]
+        failures = sum(not np.array_equal(teams, runs[0]) for teams in runs[1:])
+        failures += int(not np.isin(runs[0], (1, 2)).all())
+        if unseen_tracks is not None:
+            # Rows of tracks the cached model does not know go to team 1
+            teams = assign_teams(cache, frames, unseen_tracks)
+            known = np.isin(unseen_tracks.track_id, tracks.track_id)
+            known_team = dict(zip(tracks.track_id.tolist(), runs[0].tolist()))
+            expected = [known_team.get(track_id, 1) for track_id in unseen_tracks.track_id.tolist()]
+            failures += int(not np.array_equal(teams, expected))
+            failures += int(known.all())
+    print(f"{name}: {'OK' if failures == 0 else f'{failures} mismatches'}")
+    return failures
+
+def main():
+    frames = make_frames(20)
+    failures = 0
+    # Boxes of one pixel: no usable crop, every track falls back to team 1
+    failures += check("fallback", frames, make_tracks(20, [3, 7, 11], box_size=1))
+    # Regular crops, then tracks the cached model has never seen
+    failures += check("fitted", frames, make_tracks(20, [3, 7, 11, 15], box_size=30),
+                      unseen_tracks=make_tracks(20, [2, 7, 40], box_size=30))
+    # A cached model file holding no tracks, e.g. fitted on a clip without
+    # players: every row falls back to team 1
+    empty = TeamAssigner.lookup_track_teams(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.array([5, 9]))
+    if not np.array_equal(empty, [1, 1]):
+        failures += 1
+    print(f"empty model: {'OK' if np.array_equal(empty, [1, 1]) else 'mismatch'}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import cv2
+import numpy as np
+from utils import get_video_properties
+from view_transformer import CalibrationProfile, list_profiles, DEFAULT_CALIBRATION_DIR
+
+def parse_point(text):
+    x, y = text.split(',')
+    return float(x), float(y)
+
+def click_points(frame, count=4):
+    # Collect points clicked on the frame, in pitch-vertex order
+    points = []
+    window = "Click the pitch corners (bottom-left, top-left, top-right, bottom-right)"
+
+    def on_mouse(event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN and len(points) < count:
+            points.append((x, y))
+
+    cv2.namedWindow(window)
+    cv2.setMouseCallback(window, on_mouse)
+    while len(points) < count:
+        preview = frame.copy()
+        for point in points:
+            cv2.circle(preview, point, 6, (0, 255, 0), -1)
+        if len(points) > 1:
+            cv2.polylines(preview, [np.array(points, dtype=np.int32)], False, (0, 255, 0), 2)
+        cv2.imshow(window, preview)
+        if cv2.waitKey(20) & 0xFF == 27:
+            cv2.destroyWindow(window)
+            raise SystemExit("Calibration cancelled")
+    cv2.destroyWindow(window)
+    return points
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and list camera calibration profiles.")
+    parser.add_argument('--calibration-dir', type=str, default=DEFAULT_CALIBRATION_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    points_parser = subparsers.add_parser('points', help="Profile from the four pitch corners of the analysed area")
+    points_parser.add_argument('name')
+    points_parser.add_argument('-i', '--input', type=str, required=True, help="Video recorded from this camera angle")
+    points_parser.add_argument('--points', type=parse_point, nargs=4, metavar='X,Y', help="Pixel corners; click them on the first frame if omitted")
+    points_parser.add_argument('--target', type=parse_point, nargs=4, metavar='X,Y', help="Pitch coordinates of the corners in metres")
+
+    fit_parser = subparsers.add_parser('fit', help="Profile fitted to pitch-line landmarks")
+    fit_parser.add_argument('name')
+    fit_parser.add_argument('-i', '--input', type=str, required=True, help="Video recorded from this camera angle")
+    fit_parser.add_argument('--landmarks', type=str, required=True,
+                            help='JSON list of {"pixel": [x, y], "pitch": [x, y]} pitch-line intersections')
+    fit_parser.add_argument('--target', type=parse_point, nargs=4, metavar='X,Y', help="Pitch corners of the analysed area in metres")
+
+    subparsers.add_parser('list', help="List stored profiles")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name in list_profiles(args.calibration_dir):
+            print(name)
+        return
+
+    first_frame, _, _ = get_video_properties(args.input)
+    frame_size = (first_frame.shape[1], first_frame.shape[0])
+    target_kwargs = {} if args.target is None else {'target_vertices': args.target}
+
+    if args.command == 'points':
+        pixel_points = args.points if args.points is not None else click_points(first_frame)
+        profile = CalibrationProfile.from_points(args.name, pixel_points, frame_size, **target_kwargs)
+    else:
+        with open(args.landmarks) as f:
+            landmarks = json.load(f)
+        profile = CalibrationProfile.from_line_fit(args.name, [landmark['pixel'] for landmark in landmarks],
+                                                   [landmark['pitch'] for landmark in landmarks], frame_size, **target_kwargs)
+
+    path = profile.save(args.calibration_dir)
+    print(f"Saved calibration profile '{profile.name}' ({frame_size[0]}x{frame_size[1]}) to {path}")
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,53 @@ import cv2
 import numpy as np
 import os
 import sys 
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append('../')
-from utils import measure_distance,measure_xy_distance
+from utils import TrackStore, get_video_properties, resize_frame, draw_camera_movement_panel
+
+def estimate_chunk_movement(video_path, start, end, warmup_start, scale=1.0, **estimator_kwargs):
+    # Per-frame relative movement for frames [start, end) of a video file (end
+    # None reads to the last frame). Estimation begins at warmup_start so the
+    # tracked features have settled by the time the chunk itself starts.
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+        estimator = None
+        frame_movement = []
+        frame_num = warmup_start
+        while end is None or frame_num < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame = resize_frame(frame, scale)
+            if estimator is None:
+                estimator = CameraMovementEstimator(frame, **estimator_kwargs)
+            movement = estimator.update_frame_movement(frame)
+            if frame_num >= start:
+                frame_movement.append(movement)
+            frame_num += 1
+    finally:
+        cap.release()
+    return np.asarray(frame_movement, dtype=np.float32).reshape(-1, 2)
+
+def _estimate_chunk_movement(args):
+    video_path, start, end, warmup_start, scale, estimator_kwargs = args
+    return estimate_chunk_movement(video_path, start, end, warmup_start, scale, **estimator_kwargs)
 
 class CameraMovementEstimator():
-    def __init__(self,frame):
-        self.minimum_distance = 5
+    ESTIMATORS = ('max', 'median', 'affine')
+    # 'max' follows single features, so a chunk that re-detects them at its
+    # warmup start drifts from the sequential result; the robust estimators
+    # settle on the same movement within the overlap
+    PARALLEL_ESTIMATORS = ('median', 'affine')
+
+    def __init__(self,frame,minimum_distance=5,estimator='max'):
+        if estimator not in self.ESTIMATORS:
+            raise ValueError(f"Unknown camera movement estimator: {estimator}. Expected one of {self.ESTIMATORS}")
+        self.minimum_distance = minimum_distance
+        self.estimator = estimator
 
         self.lk_params = dict(
             winSize = (15,15),
@@ -35,7 +76,24 @@ class CameraMovementEstimator():
             mask = mask_features
         )
 
+        self.reset()
+
+    def get_estimation_params(self):
+        # Parameters that change the estimated movement (the feature mask follows the frame size)
+        features = {key: value for key, value in self.features.items() if key != 'mask'}
+        return {
+            'minimum_distance': self.minimum_distance,
+            'estimator': self.estimator,
+            'lk_params': self.lk_params,
+            'features': features,
+        }
+
     def add_adjust_positions_to_tracks(self,tracks, camera_movement_per_frame):
+        if isinstance(tracks, TrackStore):
+            camera_movement_per_frame = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2)
+            tracks.position_adjusted[:] = tracks.position - camera_movement_per_frame[tracks.frame]
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -46,75 +104,131 @@ class CameraMovementEstimator():
                     
 
 
+    def reset(self):
+        self.old_gray = None
+        self.old_features = None
+        self.total_movement = np.zeros(2, dtype=np.float32)
+
+    def estimate_frame_movement(self,old_features,new_features,status):
+        # Camera shift (old - new) between two frames from the tracked features
+        status = status.ravel().astype(bool)
+        old_points = old_features.reshape(-1, 2)[status]
+        new_points = new_features.reshape(-1, 2)[status]
+        if len(old_points) == 0:
+            return None
+
+        displacement = old_points - new_points
+        if self.estimator == 'median':
+            movement = np.median(displacement, axis=0)
+        elif self.estimator == 'affine' and len(old_points) >= 3:
+            # Rotation/zoom-aware fit, RANSAC drops features on moving players.
+            # The fit maps new to old points; its translation alone is the
+            # shift at pixel (0, 0), which a zoom makes non-zero, so the
+            # movement is the shift at the centroid of the inlier features.
+            matrix, inliers = cv2.estimateAffinePartial2D(new_points, old_points, method=cv2.RANSAC, ransacReprojThreshold=3.0)
+            if matrix is None:
+                movement = np.median(displacement, axis=0)
+            else:
+                inliers = inliers.ravel().astype(bool)
+                centroid = new_points[inliers].mean(axis=0) if inliers.any() else new_points.mean(axis=0)
+                movement = matrix[:, :2] @ centroid + matrix[:, 2] - centroid
+        elif self.estimator == 'affine':
+            movement = np.median(displacement, axis=0)
+        else:
+            # Largest single feature displacement, the original behaviour
+            distances = np.hypot(displacement[:, 0], displacement[:, 1])
+            movement = displacement[np.argmax(distances)]
+
+        if np.hypot(movement[0], movement[1]) <= self.minimum_distance:
+            return None
+        return movement.astype(np.float32)
+
+    def update_frame_movement(self,frame):
+        # Online estimation of the movement relative to the previous frame
+        frame_gray = cv2.cvtColor(frame,cv2.COLOR_BGR2GRAY)
+        movement = np.zeros(2, dtype=np.float32)
+        if self.old_gray is None or self.old_features is None or len(self.old_features) == 0:
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+            self.old_gray = frame_gray
+            return movement
+
+        new_features, status,_ = cv2.calcOpticalFlowPyrLK(self.old_gray,frame_gray,self.old_features,None,**self.lk_params)
+
+        if new_features is None or len(new_features) == 0:
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+            self.old_gray = frame_gray
+            return movement
+
+        frame_movement = self.estimate_frame_movement(self.old_features, new_features, status)
+        if frame_movement is not None:
+            movement = frame_movement
+            self.old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
+
+        self.old_gray = frame_gray
+        return movement
+
+    def update(self,frame):
+        # Online estimation: returns the accumulated movement up to this frame
+        self.total_movement = self.total_movement + self.update_frame_movement(frame)
+        return self.total_movement.copy()
+
     def get_camera_movement(self,frames,read_from_stub=False, stub_path=None):
         # Read the stub 
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path,'rb') as f:
                 return pickle.load(f)
 
-        # Fix list multiplication issue to avoid shared references
-        camera_movement = [[0,0] for _ in range(len(frames))]
-
-        old_gray = cv2.cvtColor(frames[0],cv2.COLOR_BGR2GRAY)
-        old_features = cv2.goodFeaturesToTrack(old_gray,**self.features)
-
-        for frame_num in range(1,len(frames)):
-            frame_gray = cv2.cvtColor(frames[frame_num],cv2.COLOR_BGR2GRAY)
-            if old_features is None or len(old_features) == 0:
-                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
-                old_gray = frame_gray.copy()
-                continue
-            new_features, _,_ = cv2.calcOpticalFlowPyrLK(old_gray,frame_gray,old_features,None,**self.lk_params)
-
-            if new_features is None or len(new_features) == 0:
-                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
-                old_gray = frame_gray.copy()
-                continue
-
-            max_distance = 0
-            camera_movement_x, camera_movement_y = 0,0
-
-            for i, (new,old) in enumerate(zip(new_features,old_features)):
-                new_features_point = new.ravel()
-                old_features_point = old.ravel()
-
-                distance = measure_distance(new_features_point,old_features_point)
-                if distance>max_distance:
-                    max_distance = distance
-                    camera_movement_x,camera_movement_y = measure_xy_distance(old_features_point, new_features_point ) 
-            
-            if max_distance > self.minimum_distance:
-                camera_movement[frame_num] = [camera_movement_x,camera_movement_y]
-                old_features = cv2.goodFeaturesToTrack(frame_gray,**self.features)
-
-            old_gray = frame_gray.copy()
-        
-        # Accumulate movement across frames
-        for frame_num in range(1, len(frames)):
-            camera_movement[frame_num][0] += camera_movement[frame_num-1][0]
-            camera_movement[frame_num][1] += camera_movement[frame_num-1][1]
+        # Accept any iterable of frames; only the previous grayscale frame is kept
+        self.reset()
+        frame_movement = np.array([self.update_frame_movement(frame) for frame in frames], dtype=np.float32).reshape(-1, 2)
+        camera_movement = np.cumsum(frame_movement, axis=0, dtype=np.float32)
+        if len(camera_movement) > 0:
+            self.total_movement = camera_movement[-1].copy()
         
         if stub_path is not None:
             with open(stub_path,'wb') as f:
                 pickle.dump(camera_movement,f)
 
         return camera_movement
+
+    def get_camera_movement_parallel(self,video_path,num_workers=None,chunk_size=500,overlap=30,scale=1.0):
+        # Splits the video into chunks that worker processes decode and estimate
+        # independently, each starting `overlap` frames early to warm up its
+        # features. The relative movements are concatenated in frame order and
+        # accumulated, which stitches every chunk onto the previous chunk's offset.
+        if chunk_size < 1 or overlap < 0:
+            raise ValueError("chunk_size must be at least 1 and overlap non-negative")
+        if self.estimator not in self.PARALLEL_ESTIMATORS:
+            raise ValueError(f"Parallel camera movement needs one of the {self.PARALLEL_ESTIMATORS} estimators, "
+                             f"not '{self.estimator}'")
+        _, _, frame_count = get_video_properties(video_path)
+
+        chunks = []
+        estimator_kwargs = {'minimum_distance': self.minimum_distance, 'estimator': self.estimator}
+        for start in range(0, max(frame_count, 1), chunk_size):
+            # The frame count is only an estimate, the last chunk reads to the end
+            end = start + chunk_size if start + chunk_size < frame_count else None
+            chunks.append((video_path, start, end, max(0, start - overlap), scale, estimator_kwargs))
+
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            frame_movement = list(executor.map(_estimate_chunk_movement, chunks))
+
+        self.reset()
+        camera_movement = np.cumsum(np.concatenate(frame_movement), axis=0, dtype=np.float32)
+        if len(camera_movement) > 0:
+            self.total_movement = camera_movement[-1].copy()
+        return camera_movement
     
     def draw_camera_movement(self,frames, camera_movement_per_frame):
         output_frames=[]
 
         for frame_num, frame in enumerate(frames):
             frame= frame.copy()
-
-            overlay = frame.copy()
-            cv2.rectangle(overlay,(0,0),(500,100),(255,255,255),-1)
-            alpha =0.6
-            cv2.addWeighted(overlay,alpha,frame,1-alpha,0,frame)
-
-            x_movement, y_movement = camera_movement_per_frame[frame_num]
-            frame = cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
-            frame = cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
-
+            frame = self.draw_frame_camera_movement(frame, frame_num, camera_movement_per_frame)
             output_frames.append(frame) 
 
-        return output_frames
\ No newline at end of file
+        return output_frames
+
+    def draw_frame_camera_movement(self,frame,frame_num,camera_movement_per_frame):
+        x_movement, y_movement = camera_movement_per_frame[frame_num]
+        return draw_camera_movement_panel(frame, x_movement, y_movement)
\ No newline at end of file
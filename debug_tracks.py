@@ -2,6 +2,7 @@ import pickle
 import cv2
 import numpy as np
 import os
+from utils import TrackStore
 
 stub_path = r"c:\Users\Asus\football_analysis\stubs\track_stubs_My Video.pkl"
 video_path = r"c:\Users\Asus\football_analysis\input_videos\My Video.mp4"
@@ -14,6 +15,10 @@ if not os.path.exists(stub_path):
 with open(stub_path, 'rb') as f:
     tracks = pickle.load(f)
 
+# Newer stubs hold a columnar TrackStore
+if isinstance(tracks, TrackStore):
+    tracks = tracks.as_dict()
+
 # Inspect frame 0
 if len(tracks['players']) == 0:
     print("No players in tracks!")
@@ -0,0 +1,170 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from processor import process_video
+from trackers import Tracker
+
+# Seconds between checks for dead workers
+LIVENESS_INTERVAL = 1.0
+
+class QueueFullError(Exception):
+    pass
+
+def worker_main(worker_index, job_queue, event_queue, current_job, model_path, process_kwargs):
+    # Runs in a worker process for many jobs. The detection model is loaded
+    # on the first job and kept, the tracker is reset for every new video.
+    tracker = None
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        job_number, task_id, input_path, output_path, job_kwargs = job
+        # Shared memory is seen by the server at once, the 'started' event
+        # may never arrive if the worker is killed right after taking the job
+        current_job.value = job_number
+        event_queue.put((task_id, 'started', worker_index))
+        try:
+            kwargs = dict(process_kwargs, **job_kwargs)
+            if tracker is None:
+                tracker = Tracker(model_path, backend=kwargs.get('inference_backend', 'pytorch'), int8=kwargs.get('int8', False),
+                                  calibration_data=kwargs.get('int8_calibration_data'))
+            tracker.reset()
+
+            def progress_callback(step_name, percent):
+                event_queue.put((task_id, 'progress', (step_name, percent)))
+
+            _, stats = process_video(input_path, output_path, model_path, progress_callback, tracker=tracker, **kwargs)
+            event_queue.put((task_id, 'completed', stats))
+        except Exception as e:
+            print(f"Error processing video: {e}")
+            event_queue.put((task_id, 'failed', str(e)))
+        current_job.value = 0
+
+class JobQueue():
+    # A fixed pool of long-lived worker processes fed from one FIFO job queue.
+    # At most max_queued jobs wait for a worker, further submits raise
+    # QueueFullError. Worker events (started, progress, completed, failed)
+    # are passed to on_event(task_id, event, payload) on a listener thread;
+    # a worker that dies (e.g. killed for using too much memory) fails its
+    # job and is replaced.
+    def __init__(self, num_workers, max_queued, model_path, on_event, process_kwargs=None):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if max_queued < 0:
+            raise ValueError("max_queued must not be negative")
+        self.num_workers = num_workers
+        self.max_queued = max_queued
+        self.model_path = model_path
+        self.on_event = on_event
+        self.process_kwargs = dict(process_kwargs or {})
+        # spawn: workers start clean instead of forking the web server's threads
+        self.context = multiprocessing.get_context('spawn')
+        self.job_queue = self.context.Queue()
+        self.event_queue = self.context.Queue()
+        self.lock = threading.Lock()
+        self.queued = deque()
+        # Job number -> task id of the queued jobs, job numbers start at 1
+        self.queued_jobs = {}
+        self.next_job_number = 1
+        self.running = {}
+        self.workers = []
+        self.current_jobs = [self.context.Value('q', 0) for _ in range(num_workers)]
+        self.last_liveness_check = 0.0
+        self.listener = None
+        self.stopping = False
+
+    def _start_worker(self, worker_index):
+        self.current_jobs[worker_index].value = 0
+        process = self.context.Process(target=worker_main, daemon=True,
+                                       args=(worker_index, self.job_queue, self.event_queue, self.current_jobs[worker_index],
+                                             self.model_path, self.process_kwargs))
+        process.start()
+        return process
+
+    def start(self):
+        self.workers = [self._start_worker(worker_index) for worker_index in range(self.num_workers)]
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def submit(self, task_id, input_path, output_path, **job_kwargs):
+        with self.lock:
+            if len(self.queued) >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} waiting)")
+            job_number = self.next_job_number
+            self.next_job_number += 1
+            self.queued.append(task_id)
+            self.queued_jobs[job_number] = task_id
+            self.job_queue.put((job_number, task_id, input_path, output_path, job_kwargs))
+
+    def is_full(self):
+        with self.lock:
+            return len(self.queued) >= self.max_queued
+
+    def queue_position(self, task_id):
+        # 1 for the next job a worker picks up, None once it has started
+        with self.lock:
+            try:
+                return self.queued.index(task_id) + 1
+            except ValueError:
+                return None
+
+    def _listen(self):
+        while not self.stopping:
+            try:
+                self._handle_event(*self.event_queue.get(timeout=LIVENESS_INTERVAL))
+            except queue.Empty:
+                pass
+            # Also while other workers keep sending progress
+            if time.monotonic() - self.last_liveness_check >= LIVENESS_INTERVAL:
+                self.last_liveness_check = time.monotonic()
+                self._replace_dead_workers()
+
+    def _handle_event(self, task_id, event, payload):
+        with self.lock:
+            if event == 'started':
+                self._remove_queued(task_id)
+                self.running[payload] = task_id
+            elif event in ('completed', 'failed'):
+                self.running = {worker_index: running_task for worker_index, running_task in self.running.items() if running_task != task_id}
+        self.on_event(task_id, event, payload)
+
+    def _remove_queued(self, task_id):
+        # Called with self.lock held
+        if task_id in self.queued:
+            self.queued.remove(task_id)
+        self.queued_jobs = {job_number: queued_task for job_number, queued_task in self.queued_jobs.items() if queued_task != task_id}
+
+    def _replace_dead_workers(self):
+        dead_workers = [worker_index for worker_index, process in enumerate(self.workers) if not process.is_alive()]
+        if not dead_workers or self.stopping:
+            return
+        # Handle every event the dead workers sent before they exited first
+        while True:
+            try:
+                self._handle_event(*self.event_queue.get_nowait())
+            except queue.Empty:
+                break
+        for worker_index in dead_workers:
+            process = self.workers[worker_index]
+            with self.lock:
+                task_id = self.running.pop(worker_index, None)
+                if task_id is None:
+                    # Died after taking a job but before its 'started' event was sent,
+                    # the job must not keep holding a queue slot
+                    task_id = self.queued_jobs.get(self.current_jobs[worker_index].value)
+                    if task_id is not None:
+                        self._remove_queued(task_id)
+            if task_id is not None:
+                self.on_event(task_id, 'failed', f"Worker exited unexpectedly (exit code {process.exitcode})")
+            self.workers[worker_index] = self._start_worker(worker_index)
+
+    def shutdown(self):
+        self.stopping = True
+        for _ in self.workers:
+            self.job_queue.put(None)
+        for process in self.workers:
+            process.join()
+        if self.listener is not None:
+            self.listener.join()
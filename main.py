@@ -1,11 +1,33 @@
 import os
 import argparse
-from processor import process_video
+from processor import process_video, OUTPUT_MODES
+from trackers import INFERENCE_BACKENDS
+from camera_movement_estimator import CameraMovementEstimator
+from annotation_renderer import RENDER_LAYERS
 
 def main():
     parser = argparse.ArgumentParser(description="Process football videos for analysis.")
     parser.add_argument('-i', '--input', type=str, required=True, help="Path to input video file")
     parser.add_argument('-o', '--output', type=str, required=True, help="Path to save output video file")
+    parser.add_argument('--streaming', action='store_true', help="Decode frames lazily to keep memory constant for long videos")
+    parser.add_argument('--prefetch', type=int, default=0, help="With --streaming, number of frames to decode ahead on a background thread")
+    parser.add_argument('--backend', type=str, default='pytorch', choices=INFERENCE_BACKENDS, help="Inference backend for object detection")
+    parser.add_argument('--int8', action='store_true', help="Use an INT8-quantized export with the onnx/openvino backends")
+    parser.add_argument('--int8-calibration', type=str, default=None, help="Dataset YAML to calibrate the openvino INT8 export with")
+    parser.add_argument('--detection-stride', type=int, default=1, help="Run detection every N frames and interpolate in between")
+    parser.add_argument('--adaptive-stride', action='store_true', help="Detect every frame while motion is high")
+    parser.add_argument('--analysis-scale', type=float, default=1.0, help="Downsample factor (0-1] for analysis; output keeps source resolution")
+    parser.add_argument('--camera-estimator', type=str, default='max', choices=CameraMovementEstimator.ESTIMATORS, help="How camera motion is estimated from the tracked features")
+    parser.add_argument('--calibration-profile', type=str, default=None, help="Named camera calibration created with calibrate.py")
+    parser.add_argument('--speed-smoothing', type=int, default=1, help="Average speeds over this many measurement windows")
+    parser.add_argument('--team-assignment', type=str, default='first_frame', choices=['first_frame', 'vote'], help="Fit teams on frame 0, or vote per track over crops sampled across the video")
+    parser.add_argument('--team-samples', type=int, default=10, help="With --team-assignment vote, crops sampled per track")
+    parser.add_argument('--team-workers', type=int, default=1, help="Threads for player crop and jersey colour work")
+    parser.add_argument('--camera-workers', type=int, default=0, help="Estimate camera motion in parallel chunks on this many processes (median/affine estimators)")
+    parser.add_argument('--layers', type=str, nargs='+', default=None, choices=RENDER_LAYERS, help="Overlay layers drawn on the output video (default: all)")
+    parser.add_argument('--output-mode', type=str, default='video', choices=OUTPUT_MODES, help="'overlay' writes a JSON lines overlay sidecar to --output instead of rendering a video")
+    parser.add_argument('--render-workers', type=int, default=1, help="Threads drawing output frames while earlier ones are encoded")
+    parser.add_argument('--print-stats', action='store_true', help="Print prefetch and frame cache statistics when done")
     
     args = parser.parse_args()
     
@@ -25,7 +47,15 @@ def main():
         print(f"[{percent}%] {step_name}")
         
     try:
-        output_path, stats = process_video(args.input, args.output, MODEL_PATH, progress_callback)
+        output_path, stats = process_video(args.input, args.output, MODEL_PATH, progress_callback, streaming=args.streaming, prefetch_frames=args.prefetch,
+                                           inference_backend=args.backend, int8=args.int8, int8_calibration_data=args.int8_calibration,
+                                           detection_stride=args.detection_stride, adaptive_stride=args.adaptive_stride,
+                                           analysis_scale=args.analysis_scale, camera_estimator=args.camera_estimator,
+                                           camera_workers=args.camera_workers, calibration_profile=args.calibration_profile,
+                                           speed_smoothing_window=args.speed_smoothing, team_assignment=args.team_assignment,
+                                           team_samples_per_track=args.team_samples, team_workers=args.team_workers,
+                                           render_layers=args.layers, render_workers=args.render_workers,
+                                           output_mode=args.output_mode, print_stats=args.print_stats)
         print("\n" + "="*40)
         print("FINAL ANALYSIS STATS")
         print("="*40)
@@ -35,7 +65,10 @@ def main():
         print(f"Team 2 Possession: {stats['team_2']['possession']}% | Team 2 Color: {stats['team_2']['color']}")
         print(f"   Max Speed: {stats['team_2']['max_speed']} km/h | Distance: {stats['team_2']['total_distance']} m")
         print("="*40)
-        print(f"\nAnalysis complete! Video saved successfully at: {output_path}")
+        if args.output_mode == 'overlay':
+            print(f"\nAnalysis complete! Overlays saved successfully at: {output_path}")
+        else:
+            print(f"\nAnalysis complete! Video saved successfully at: {output_path}")
         
     except Exception as e:
         print(f"Processing failed: {e}")
@@ -1,13 +1,13 @@
+import numpy as np
 import sys 
 sys.path.append('../')
-from utils import get_center_of_bbox, measure_distance
+from utils import get_center_of_bbox, measure_distance, TrackStore
 
 class PlayerBallAssigner():
     def __init__(self):
         self.max_player_ball_distance = 70
     
     def assign_ball_to_player(self,players,ball_bbox):
-        import numpy as np
         if not ball_bbox or len(ball_bbox) < 4 or np.isnan(ball_bbox).any():
             return -1
         
@@ -30,4 +30,65 @@ class PlayerBallAssigner():
                     minimum_distance = distance
                     assigned_player = player_id
 
-        return assigned_player
\ No newline at end of file
+        return assigned_player
+
+    def assign_balls_to_players(self,ball_positions,player_frames,player_bboxes):
+        # Batch assign_ball_to_player for a whole video.
+        # ball_positions: (F, 2) ball centres, NaN in frames without a ball
+        # player_frames, player_bboxes: frame number and bbox of every player row
+        # Returns the assigned player row per frame (F,), -1 where nobody is close.
+        # With a single ball per frame this is one distance per player row, so
+        # plain broadcasting is enough and no spatial index is needed.
+        ball_positions = np.asarray(ball_positions, dtype=np.float64).reshape(-1, 2)
+        player_frames = np.asarray(player_frames, dtype=np.int64)
+        player_bboxes = np.asarray(player_bboxes, dtype=np.float64).reshape(-1, 4)
+        assigned_rows = np.full(len(ball_positions), -1, dtype=np.int64)
+        if len(player_frames) == 0:
+            return assigned_rows
+
+        # Distance from the ball to the nearer bottom corner of each player box.
+        # np.float_power rounds like measure_distance's ** so ties and the
+        # threshold resolve exactly as in the per-frame loop.
+        ball = ball_positions[player_frames]
+        def distance_to(x):
+            return np.float_power(np.float_power(x - ball[:, 0], 2) + np.float_power(player_bboxes[:, 3] - ball[:, 1], 2), 0.5)
+        distance = np.minimum(distance_to(player_bboxes[:, 0]), distance_to(player_bboxes[:, 2]))
+        candidates = np.flatnonzero(distance < self.max_player_ball_distance)
+        if len(candidates) == 0:
+            return assigned_rows
+
+        # Nearest candidate per frame; on equal distance the earlier row wins
+        order = np.lexsort((candidates, distance[candidates], player_frames[candidates]))
+        candidates = candidates[order]
+        first = np.r_[True, np.diff(player_frames[candidates]) != 0]
+        assigned_rows[player_frames[candidates[first]]] = candidates[first]
+        return assigned_rows
+
+    @staticmethod
+    def get_team_ball_control(assigned_rows, player_teams):
+        # Team in possession per frame; frames where nobody has the ball keep
+        # the previous team (0 before the first possession)
+        assigned_rows = np.asarray(assigned_rows)
+        frame_index = np.where(assigned_rows >= 0, np.arange(len(assigned_rows)), -1)
+        last_possession = np.maximum.accumulate(frame_index) if len(frame_index) else frame_index
+        team_ball_control = np.zeros(len(assigned_rows), dtype=np.int64)
+        possessed = last_possession >= 0
+        team_ball_control[possessed] = np.asarray(player_teams)[assigned_rows[last_possession[possessed]]]
+        return team_ball_control
+
+    def assign_ball_possession(self,tracks):
+        # Marks has_ball on the TrackStore and returns the team in possession per frame
+        if not isinstance(tracks, TrackStore):
+            raise TypeError("assign_ball_possession expects a TrackStore")
+        ball_positions = np.full((tracks.num_frames, 2), np.nan)
+        ball_rows = np.flatnonzero(tracks.class_mask('ball') & (tracks.track_id == 1))
+        ball_bboxes = tracks.bbox[ball_rows].astype(np.float64)
+        # get_center_of_bbox truncates to integer pixels
+        ball_positions[tracks.frame[ball_rows]] = np.trunc(np.stack([(ball_bboxes[:, 0] + ball_bboxes[:, 2]) / 2,
+                                                                    (ball_bboxes[:, 1] + ball_bboxes[:, 3]) / 2], axis=1))
+
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        assigned = self.assign_balls_to_players(ball_positions, tracks.frame[player_rows], tracks.bbox[player_rows])
+        has_ball = assigned >= 0
+        tracks.has_ball[player_rows[assigned[has_ball]]] = True
+        return self.get_team_ball_control(assigned, tracks.team[player_rows].astype(np.int64))
@@ -2,19 +2,62 @@ import os
 import cv2
 import numpy as np
 import sys
-import subprocess
-from utils import read_video, save_video
-from trackers import Tracker
+from utils import read_video, save_video, get_video_properties, iter_video_frames, resize_frame, PrefetchingVideoReader, FrameProductCache, TrackStore, TrackStoreBuilder, ResultCache, MatchStats, bgr_to_hex, hash_file
+from trackers import Tracker, check_export_options
 from team_assigner import TeamAssigner
 from player_ball_assigner import PlayerBallAssigner
 from camera_movement_estimator import CameraMovementEstimator
-from view_transformer import ViewTransformer
+from view_transformer import ViewTransformer, CalibrationProfile, DEFAULT_CALIBRATION_DIR
 from speed_and_distance_estimator import SpeedAndDistance_Estimator
+from annotation_renderer import AnnotationRenderer, RENDER_LAYERS
 
-def process_video(input_path, output_path, model_path, progress_callback=None):
+OUTPUT_MODES = ('video', 'overlay')
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+def process_video(input_path, output_path, model_path, progress_callback=None, streaming=False, prefetch_frames=0,
+                  inference_backend='pytorch', int8=False, int8_calibration_data=None, cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes=5 * 1024**3,
+                  detection_stride=1, adaptive_stride=False, analysis_scale=1.0, camera_estimator='max',
+                  camera_workers=0, frame_cache_bytes=256 * 1024**2, calibration_profile=None,
+                  calibration_dir=DEFAULT_CALIBRATION_DIR, speed_smoothing_window=1, team_assignment='first_frame',
+                  team_samples_per_track=10, team_workers=1, render_layers=None,
+                  render_workers=1, output_mode='video', tracker=None, print_stats=False):
     """
     Process a football video and save the result.
     progress_callback: A function that accepts a string (step name) and an integer (0-100).
+    streaming: Decode frames lazily for every pass instead of holding the whole video in memory.
+    prefetch_frames: In streaming mode, decode up to this many frames ahead on a background thread (0 disables).
+    inference_backend: 'pytorch', 'onnx' or 'openvino'. Exports are cached next to the model.
+    int8: Use an INT8-quantized export (ONNX / OpenVINO backends only).
+    int8_calibration_data: Dataset YAML used to calibrate the OpenVINO INT8 export (None uses the ultralytics default).
+                           ONNX exports are quantized dynamically and take no calibration data.
+    cache_dir: Directory for cached tracks and camera movement, keyed by video, model and parameters (None disables).
+    cache_max_bytes: Size limit of the cache directory; least recently used entries are evicted.
+    detection_stride: Run YOLO every N frames and interpolate player/referee bboxes in between.
+    adaptive_stride: Fall back to detecting every frame while motion or camera movement is high.
+    analysis_scale: Downsample frames once by this factor for detection, camera motion and team colours.
+                    Results are mapped back to source coordinates, the output video keeps its resolution.
+    camera_estimator: 'max' (largest feature shift), 'median' or 'affine' (RANSAC similarity fit) camera motion estimate.
+    camera_workers: Estimate camera motion in overlapping chunks on this many processes (0 runs it inline with tracking).
+                    Needs the 'median' or 'affine' camera_estimator.
+    frame_cache_bytes: Memory budget for downsampled analysis frames kept for the later analysis passes
+                       (camera movement, team assignment). Passes read the video from the start, so the first
+                       frames that fit are kept and the rest are downsampled again by each pass.
+                       Unused at analysis_scale 1, where the analysis frame is the decoded frame.
+    calibration_profile: Name of a stored camera calibration (see calibrate.py) used for pitch coordinates.
+                         None uses the default broadcast angle.
+    calibration_dir: Directory holding the calibration profiles.
+    speed_smoothing_window: Average player speeds over this many consecutive measurement windows (1 disables).
+    team_assignment: 'first_frame' fits team colours on frame 0 and fixes each track's team on first sight,
+                     'vote' samples crops of every track across the video and assigns teams by majority vote.
+    team_samples_per_track: In 'vote' mode, number of crops kept per track.
+    team_workers: Threads used for player crop extraction and jersey colour clustering.
+    render_layers: Overlays drawn on the output video, any of annotation_renderer.RENDER_LAYERS (None draws all).
+    render_workers: Threads drawing output frames ahead of the video writer, which still receives them in order.
+    output_mode: 'video' burns the overlays into an MP4 at output_path, 'overlay' skips rendering and encoding
+                 and writes the overlays as a JSON lines sidecar at output_path for drawing over the original video.
+    tracker: A Tracker for model_path to reuse instead of loading the model again, e.g. in a long-lived worker.
+             It is reset before tracking and takes this call's detection_stride and adaptive_stride.
+    print_stats: Print prefetch and frame cache statistics when done.
     """
 
     def update_progress(step_name, percent):
@@ -28,161 +71,231 @@ def process_video(input_path, output_path, model_path, progress_callback=None):
         raise FileNotFoundError(f"Input video not found: {input_path}")
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found: {model_path}")
+    check_export_options(inference_backend, int8, int8_calibration_data)
+    if camera_workers > 0 and camera_estimator not in CameraMovementEstimator.PARALLEL_ESTIMATORS:
+        raise ValueError(f"camera_workers needs one of the {CameraMovementEstimator.PARALLEL_ESTIMATORS} "
+                         f"camera estimators, not '{camera_estimator}'")
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}. Expected one of {OUTPUT_MODES}")
+    if render_layers is not None and not set(render_layers) <= set(RENDER_LAYERS):
+        raise ValueError(f"Unknown render layers: {sorted(set(render_layers) - set(RENDER_LAYERS))}. Expected any of {RENDER_LAYERS}")
+    profile = None
+    if calibration_profile is not None:
+        profile = CalibrationProfile.load(calibration_profile, calibration_dir)
 
     # Read Video
     update_progress("Reading video...", 5)
-    video_frames, fps = read_video(input_path)
+    if streaming:
+        # Each pass re-decodes the video so peak memory does not grow with its length
+        first_frame, fps, _ = get_video_properties(input_path)
+        prefetch_readers = []
+
+        def frame_source(pass_name):
+            if prefetch_frames > 0:
+                reader = PrefetchingVideoReader(input_path, queue_size=prefetch_frames)
+                prefetch_readers.append((pass_name, reader))
+                return iter(reader)
+            return iter_video_frames(input_path)
+    else:
+        video_frames, fps = read_video(input_path)
+        first_frame = video_frames[0]
+
+        def frame_source(pass_name):
+            return iter(video_frames)
     
+    if not 0 < analysis_scale <= 1:
+        raise ValueError(f"analysis_scale must be in (0, 1], got {analysis_scale}")
+
+    # The first downsampled analysis frames that fit the budget are kept for
+    # the later analysis passes, the rest are downsampled again by each pass
+    frame_cache = FrameProductCache({'analysis': lambda frame: resize_frame(frame, analysis_scale)},
+                                    max_bytes=frame_cache_bytes)
+    analysis_first_frame = frame_cache.get(0, 'analysis', first_frame)
+
+    def analysis_source(pass_name):
+        for frame_num, frame in enumerate(frame_source(pass_name)):
+            yield frame_cache.get(frame_num, 'analysis', frame)
+
+    # Results are cached by content, so re-running the same upload skips detection
+    cache = None
+    if cache_dir is not None:
+        cache = ResultCache(cache_dir, max_size_bytes=cache_max_bytes)
+        video_hash = hash_file(input_path)
+        model_hash = hash_file(model_path)
+
     # Initialize Tracker
     update_progress("Initializing tracker...", 10)
-    tracker = Tracker(model_path)
+    if tracker is None:
+        tracker = Tracker(model_path, backend=inference_backend, int8=int8, calibration_data=int8_calibration_data,
+                          detection_stride=detection_stride, adaptive_stride=adaptive_stride)
+    else:
+        if (tracker.backend, tracker.int8, tracker.calibration_data) != (inference_backend, int8, int8_calibration_data):
+            raise ValueError(f"Tracker was created for backend={tracker.backend}, int8={tracker.int8}, "
+                             f"calibration_data={tracker.calibration_data}, not backend={inference_backend}, "
+                             f"int8={int8}, calibration_data={int8_calibration_data}")
+        tracker.detection_stride = max(1, int(detection_stride))
+        tracker.adaptive_stride = adaptive_stride
+
+    # Movement threshold is 5 px at source resolution
+    camera_movement_estimator = CameraMovementEstimator(analysis_first_frame, minimum_distance=5 * analysis_scale,
+                                                        estimator=camera_estimator)
+
+    # Look up cached tracks and camera movement
+    cached_tracks = None
+    cached_camera_movement = None
+    if cache is not None:
+        tracks_key = ResultCache.make_key('tracks', video=video_hash, model=model_hash, analysis_scale=analysis_scale,
+                                          **tracker.get_detection_params())
+        camera_key = ResultCache.make_key('camera_movement', video=video_hash, analysis_scale=analysis_scale,
+                                          **camera_movement_estimator.get_estimation_params())
+        cached_tracks = cache.load(tracks_key, required=TrackStore.COLUMNS + ('num_frames',))
+        cached_camera_movement = cache.load(camera_key, required=('camera_movement',))
+    camera_movement_per_frame = None
+    if cached_camera_movement is not None:
+        camera_movement_per_frame = cached_camera_movement['camera_movement']
+    elif camera_workers > 0:
+        update_progress("Estimating camera movement...", 12)
+        camera_movement_per_frame = camera_movement_estimator.get_camera_movement_parallel(
+            input_path, num_workers=camera_workers, scale=analysis_scale) / analysis_scale
 
     # Get object tracks
-    # Note: We are NOT using stubs here to ensure fresh processing for web uploads
     update_progress("Tracking objects...", 15)
-    tracks = tracker.get_object_tracks(video_frames, read_from_stub=False)
-    
+    # Tracks live in a columnar store; every stage below runs vectorized over it
+    if cached_tracks is not None:
+        tracks = TrackStore.from_arrays(cached_tracks)
+    else:
+        # Camera movement is estimated online in the same decode pass, on each
+        # frame as soon as its detection batch has been tracked
+        estimate_camera_movement = camera_movement_per_frame is None
+        tracker.reset()
+        camera_movement_estimator.reset()
+        builder = TrackStoreBuilder()
+        online_camera_movement = []
+        for frame_num, (frame, frame_tracks) in enumerate(tracker.iter_object_tracks(analysis_source("Tracking"))):
+            builder.add_frame(frame_num, frame_tracks)
+            if estimate_camera_movement:
+                online_camera_movement.append(camera_movement_estimator.update_frame_movement(frame))
+        tracks = builder.build(tracker.frame_count)
+        tracks.rescale(1 / analysis_scale)
+        if estimate_camera_movement:
+            camera_movement_per_frame = np.cumsum(np.asarray(online_camera_movement, dtype=np.float32).reshape(-1, 2), axis=0, dtype=np.float32) / analysis_scale
+        if cache is not None:
+            cache.save(tracks_key, tracks.to_arrays())
+
     update_progress("Adding positions to tracks...", 40)
     tracker.add_position_to_tracks(tracks)
 
     # Camera movement estimator
     update_progress("Estimating camera movement...", 45)
-    camera_movement_estimator = CameraMovementEstimator(video_frames[0])
-    camera_movement_per_frame = camera_movement_estimator.get_camera_movement(video_frames, read_from_stub=False)
+    if camera_movement_per_frame is not None and len(camera_movement_per_frame) != tracks.num_frames:
+        # The parallel chunks follow the container's frame count, which need
+        # not match the frames actually decoded; estimate sequentially instead
+        print(f"Camera movement covers {len(camera_movement_per_frame)} of {tracks.num_frames} frames, estimating it again")
+        camera_movement_per_frame = None
+        cached_camera_movement = None
+    if camera_movement_per_frame is None:
+        camera_movement_per_frame = camera_movement_estimator.get_camera_movement(analysis_source("Camera movement"), read_from_stub=False)
+        camera_movement_per_frame = np.asarray(camera_movement_per_frame, dtype=np.float32).reshape(-1, 2) / analysis_scale
+    if cache is not None and cached_camera_movement is None:
+        cache.save(camera_key, {'camera_movement': camera_movement_per_frame})
     camera_movement_estimator.add_adjust_positions_to_tracks(tracks, camera_movement_per_frame)
 
     # View Transformer
     update_progress("Transforming view...", 60)
-    frame_h, frame_w = video_frames[0].shape[:2]
-    view_transformer = ViewTransformer(frame_width=frame_w, frame_height=frame_h)
+    frame_h, frame_w = first_frame.shape[:2]
+    view_transformer = ViewTransformer(frame_width=frame_w, frame_height=frame_h, profile=profile)
     view_transformer.add_transformed_position_to_tracks(tracks)
 
     # Interpolate Ball Positions
     update_progress("Interpolating ball positions...", 65)
-    tracks["ball"] = tracker.interpolate_ball_positions(tracks["ball"])
+    tracker.interpolate_ball_positions(tracks)
 
     # Speed and distance estimator
     update_progress("Calculating speed and distance...", 70)
-    speed_and_distance_estimator = SpeedAndDistance_Estimator(fps=fps)
+    speed_and_distance_estimator = SpeedAndDistance_Estimator(fps=fps, smoothing_window=speed_smoothing_window)
     speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks)
 
     # Assign Player Teams
     update_progress("Assigning player teams...", 75)
-    team_assigner = TeamAssigner()
-    team_assigner.assign_team_color(video_frames[0], tracks['players'][0])
-    
-    for frame_num, player_track in enumerate(tracks['players']):
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(video_frames[frame_num],   
-                                                 track['bbox'],
-                                                 player_id)
-            tracks['players'][frame_num][player_id]['team'] = team 
-            tracks['players'][frame_num][player_id]['team_color'] = team_assigner.team_colors.get(team, (0, 0, 255))
+    team_assigner = TeamAssigner(num_workers=team_workers)
+    if team_assignment == 'vote':
+        # One team per track voted over crops sampled across the whole video;
+        # the fitted model is cached so re-renders skip the sampling pass
+        team_model = None
+        if cache is not None:
+            team_key = ResultCache.make_key('team_model', tracks=tracks_key, analysis_scale=analysis_scale,
+                                            samples_per_track=team_samples_per_track, crop_size=team_assigner.crop_size)
+            team_model = cache.load(team_key, required=('team_colors', 'track_ids', 'teams'))
+        if team_model is not None:
+            track_ids, teams = team_assigner.load_team_model(team_model)
+        else:
+            track_ids, teams = team_assigner.fit_track_teams(analysis_source("Team assignment"), tracks,
+                                                             samples_per_track=team_samples_per_track, scale=analysis_scale)
+            if cache is not None:
+                cache.save(team_key, team_assigner.get_team_model())
+
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        row_teams = TeamAssigner.lookup_track_teams(track_ids, teams, tracks.track_id[player_rows])
+        team_colors = np.array([team_assigner.team_colors[1], team_assigner.team_colors[2]], dtype=np.float32)
+        tracks.team[player_rows] = row_teams
+        tracks.team_color[player_rows] = team_colors[row_teams - 1]
+    elif team_assignment == 'first_frame':
+        # Crops are taken from the downsampled analysis frames
+        first_frame_rows = tracks.rows(0, 'players')
+        first_frame_players = {int(track_id): {"bbox": bbox * analysis_scale}
+                               for track_id, bbox in zip(tracks.track_id[first_frame_rows], tracks.bbox[first_frame_rows])}
+        team_assigner.assign_team_color(analysis_first_frame, first_frame_players)
+
+        # Each track keeps the team of its first usable crop
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        row_teams = team_assigner.assign_first_sight_teams(analysis_source("Team assignment"), tracks, scale=analysis_scale)
+        team_colors = np.array([team_assigner.team_colors[1], team_assigner.team_colors[2]], dtype=np.float32)
+        tracks.team[player_rows] = row_teams
+        tracks.team_color[player_rows] = team_colors[row_teams - 1]
+    else:
+        raise ValueError(f"Unknown team assignment mode: {team_assignment}. Expected 'first_frame' or 'vote'")
+    team_assigner.close()
 
     # Assign Ball Acquisition
     update_progress("Assigning ball acquisition...", 85)
     player_assigner = PlayerBallAssigner()
-    team_ball_control = []
-    for frame_num, player_track in enumerate(tracks['players']):
-        if 1 not in tracks['ball'][frame_num] or 'bbox' not in tracks['ball'][frame_num][1]:
-            if len(team_ball_control) > 0:
-                team_ball_control.append(team_ball_control[-1])
-            else:
-                team_ball_control.append(0)
-            continue
-            
-        ball_bbox = tracks['ball'][frame_num][1]['bbox']
-        assigned_player = player_assigner.assign_ball_to_player(player_track, ball_bbox)
-
-        if assigned_player != -1:
-            tracks['players'][frame_num][assigned_player]['has_ball'] = True
-            team_ball_control.append(tracks['players'][frame_num][assigned_player]['team'])
-        else:
-            if len(team_ball_control) > 0:
-                team_ball_control.append(team_ball_control[-1])
-            else:
-                team_ball_control.append(0)
-    team_ball_control = np.array(team_ball_control)
-
-    # Draw output 
-    update_progress("Drawing annotations...", 90)
-    output_video_frames = tracker.draw_annotations(video_frames, tracks, team_ball_control)
-    output_video_frames = camera_movement_estimator.draw_camera_movement(output_video_frames, camera_movement_per_frame)
-    speed_and_distance_estimator.draw_speed_and_distance(output_video_frames, tracks)
-
-    # Save video with FFmpeg Conversion for Browser Compatibility
-    update_progress("Saving and Converting Video...", 95)
-    
-    # Save to a temporary AVI file first (since save_video uses XVID)
-    temp_output_path = output_path.replace('.mp4', '_temp.avi')
-    if temp_output_path == output_path:
-        temp_output_path += "_temp.avi"
-        
-    save_video(output_video_frames, temp_output_path, fps=fps)
-    
-    # Convert to browser-compatible MP4 (H.264) using FFmpeg
-    try:
-        command = [
-            'ffmpeg', '-y', 
-            '-i', temp_output_path, 
-            '-vcodec', 'libx264', 
-            '-preset', 'fast',    # Faster encoding
-            '-crf', '23',         # Standard quality
-            '-acodec', 'aac', 
-            '-movflags', '+faststart', # Enable web streaming
-            output_path
-        ]
-        subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        
-        # Cleanup temp file
-        if os.path.exists(temp_output_path):
-            os.remove(temp_output_path)
-            
-    except Exception as e:
-        print(f"FFmpeg conversion failed: {e}")
-        # Fallback: Just rename the temp file if conversion fails (better than nothing)
-        if os.path.exists(temp_output_path):
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            os.rename(temp_output_path, output_path)
+    # Nearest player to the ball in every frame at once, with possession
+    # carried forward through frames where nobody has the ball
+    team_ball_control = player_assigner.assign_ball_possession(tracks)
+    # Possession, top speed and distance so far for every frame, built once
+    match_stats = MatchStats(team_ball_control, tracks)
+
+    renderer = AnnotationRenderer(tracks, match_stats, camera_movement_per_frame, layers=render_layers)
+    if output_mode == 'overlay':
+        # Overlays only, the client draws them over the original video, so
+        # there is no rendering pass and nothing to encode
+        update_progress("Saving overlays...", 95)
+        renderer.save_overlays(output_path, (first_frame.shape[1], first_frame.shape[0]), fps)
+    else:
+        # Draw output 
+        # Frames are annotated in place as the writer consumes them, all overlay
+        # layers in a single pass per frame, on render_workers threads
+        update_progress("Drawing annotations...", 90)
+        rendered_frames = renderer.render_frames(frame_source("Rendering"), num_workers=render_workers)
+
+        # Save video as browser-compatible MP4 (H.264), piping frames straight into FFmpeg
+        # Falls back to the OpenCV writer when FFmpeg is not installed
+        update_progress("Saving and Converting Video...", 95)
+        save_video(rendered_frames, output_path, fps=fps, backend='ffmpeg')
     
+    if print_stats:
+        if streaming and prefetch_frames > 0:
+            # Decode vs stall times per pass, used to size the prefetch queue
+            for pass_name, reader in prefetch_readers:
+                print(f"Prefetch stats ({pass_name}): {reader.get_stats()}")
+        print(f"Frame cache stats: {frame_cache.get_stats()}")
+
     update_progress("Computing Stats...", 98)
-    team_1_frames = float(np.sum(team_ball_control == 1))
-    team_2_frames = float(np.sum(team_ball_control == 2))
-    total_frames_with_ball = team_1_frames + team_2_frames
-
-    possession_team_1 = team_1_frames / total_frames_with_ball if total_frames_with_ball > 0 else 0
-    possession_team_2 = team_2_frames / total_frames_with_ball if total_frames_with_ball > 0 else 0
-
-    def bgr_to_hex(bgr):
-        return f"#{int(bgr[2]):02x}{int(bgr[1]):02x}{int(bgr[0]):02x}"
-        
-    team_1_max_speed = 0.0
-    team_2_max_speed = 0.0
-    player_distances = {1: {}, 2: {}} 
-
-    for frame_num in range(len(tracks['players'])):
-        for track_id, track_info in tracks['players'][frame_num].items():
-            team = track_info.get('team')
-            if team not in (1, 2):
-                continue
-            
-            speed = track_info.get('speed', 0.0)
-            distance = track_info.get('distance', 0.0)
-            
-            if team == 1:
-                if speed > team_1_max_speed:
-                    team_1_max_speed = speed
-                if track_id not in player_distances[1] or distance > player_distances[1][track_id]:
-                    player_distances[1][track_id] = distance
-            elif team == 2:
-                if speed > team_2_max_speed:
-                    team_2_max_speed = speed
-                if track_id not in player_distances[2] or distance > player_distances[2][track_id]:
-                    player_distances[2][track_id] = distance
-
-    team_1_total_distance = sum(player_distances[1].values())
-    team_2_total_distance = sum(player_distances[2].values())
+    # Final state of the running stats the renderer already used
+    final_stats = match_stats.get_final_stats()
+    possession_team_1, possession_team_2 = final_stats[1]['possession'], final_stats[2]['possession']
+    team_1_max_speed, team_2_max_speed = final_stats[1]['max_speed'], final_stats[2]['max_speed']
+    team_1_total_distance, team_2_total_distance = final_stats[1]['total_distance'], final_stats[2]['total_distance']
 
     stats = {
         'team_1': {
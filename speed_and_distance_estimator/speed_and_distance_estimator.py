@@ -1,14 +1,20 @@
-import cv2
+import numpy as np
 import sys 
 sys.path.append('../')
-from utils import measure_distance ,get_foot_position
+from utils import measure_distance, TrackStore, draw_speed_and_distance_text
 
 class SpeedAndDistance_Estimator():
-    def __init__(self, fps=24):
-        self.frame_window=5
+    def __init__(self, fps=24, frame_window=5, smoothing_window=1):
+        self.frame_window=frame_window
         self.frame_rate=fps
+        # Speeds averaged over this many consecutive measurements (TrackStore only)
+        self.smoothing_window=smoothing_window
     
     def add_speed_and_distance_to_tracks(self,tracks):
+        if isinstance(tracks, TrackStore):
+            self.add_speed_and_distance_to_track_store(tracks)
+            return
+
         total_distance= {}
 
         for object, object_tracks in tracks.items():
@@ -54,27 +60,110 @@ class SpeedAndDistance_Estimator():
                         tracks[object][frame_num_batch][track_id]['speed'] = speed_km_per_hour
                         tracks[object][frame_num_batch][track_id]['distance'] = total_distance[object][track_id]
     
+    def add_speed_and_distance_to_track_store(self,tracks):
+        # Same windowing as the dict implementation without looping over windows:
+        # every (window, track) pair is measured at once, distances are summed
+        # per track with np.cumsum and the results scattered to the window rows
+        number_of_frames = tracks.num_frames
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        if len(player_rows) == 0:
+            return
+        frames = tracks.frame[player_rows].astype(np.int64)
+        track_ids = tracks.track_id[player_rows].astype(np.int64)
+        id_count = int(track_ids.max()) + 1
+
+        # Windows start every frame_window frames and end at the next start (or the last frame)
+        window = frames // self.frame_window
+        window_start = window * self.frame_window
+        window_end = np.minimum(window_start + self.frame_window, number_of_frames - 1)
+
+        # Player row of each (frame, track id)
+        keys = frames * id_count + track_ids
+        key_order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[key_order]
+
+        def find_rows(frame_nums, ids):
+            lookup = frame_nums * id_count + ids
+            index = np.minimum(np.searchsorted(sorted_keys, lookup), len(sorted_keys) - 1)
+            found = sorted_keys[index] == lookup
+            return np.where(found, key_order[index], -1)
+
+        # One measurement per track present at the start of a window
+        is_start = (frames == window_start) & (window_end > window_start)
+        start_index = np.flatnonzero(is_start)
+        end_index = find_rows(window_end[start_index], track_ids[start_index])
+        start_index = start_index[end_index >= 0]
+        end_index = end_index[end_index >= 0]
+
+        start_position = tracks.position_transformed[player_rows[start_index]].astype(np.float64)
+        end_position = tracks.position_transformed[player_rows[end_index]].astype(np.float64)
+        valid = ~(np.isnan(start_position).any(axis=1) | np.isnan(end_position).any(axis=1))
+        start_index = start_index[valid]
+        if len(start_index) == 0:
+            return
+
+        # np.float_power calls libm pow like measure_distance's **2 and **0.5,
+        # which can differ from x*x and sqrt in the last bit
+        difference = start_position[valid]-end_position[valid]
+        distance_covered = np.float_power(np.float_power(difference[:, 0], 2) + np.float_power(difference[:, 1], 2), 0.5)
+        time_elapsed = (window_end[start_index]-window_start[start_index])/self.frame_rate
+
+        # Running distance per track in window order as one segmented cumsum:
+        # a cumsum over all measurements sorted by track, minus the total
+        # before each track's first measurement
+        measurement_ids = track_ids[start_index]
+        order = np.argsort(measurement_ids, kind='stable')
+        group_starts = np.flatnonzero(np.r_[True, np.diff(measurement_ids[order]) != 0])
+        group_lengths = np.diff(np.r_[group_starts, len(order)])
+        cumulative_distance = np.cumsum(distance_covered[order])
+        distance_offset = np.repeat(np.r_[0.0, cumulative_distance][group_starts], group_lengths)
+        total_distance = np.empty(len(order))
+        total_distance[order] = cumulative_distance - distance_offset
+        speed_km_per_hour = np.empty(len(order))
+        if self.smoothing_window <= 1:
+            speed_km_per_hour = distance_covered/time_elapsed*3.6
+        else:
+            # Average speed over the last smoothing_window measurements of
+            # the track, from the same prefix sums
+            cumulative_time = np.cumsum(time_elapsed[order])
+            time_offset = np.repeat(np.r_[0.0, cumulative_time][group_starts], group_lengths)
+            position = np.arange(len(order)) - np.repeat(group_starts, group_lengths)
+            lag = np.maximum(np.arange(len(order)) - self.smoothing_window, 0)
+            has_lag = position >= self.smoothing_window
+            distance_before = np.where(has_lag, cumulative_distance[lag], distance_offset)
+            time_before = np.where(has_lag, cumulative_time[lag], time_offset)
+            speed_km_per_hour[order] = (cumulative_distance-distance_before)/(cumulative_time-time_before)*3.6
+
+        # Scatter to every player row in [window_start, window_end) of a measured track
+        measurement_keys = window[start_index] * id_count + measurement_ids
+        measurement_order = np.argsort(measurement_keys)
+        sorted_measurement_keys = measurement_keys[measurement_order]
+        in_window = frames < window_end
+        row_keys = window * id_count + track_ids
+        index = np.minimum(np.searchsorted(sorted_measurement_keys, row_keys), len(sorted_measurement_keys) - 1)
+        measured = in_window & (sorted_measurement_keys[index] == row_keys)
+        measurement = measurement_order[index[measured]]
+        tracks.speed[player_rows[measured]] = speed_km_per_hour[measurement]
+        tracks.distance[player_rows[measured]] = total_distance[measurement]
+
     def draw_speed_and_distance(self,frames,tracks):
         output_frames = []
         for frame_num, frame in enumerate(frames):
-            for object, object_tracks in tracks.items():
-                if object == "ball" or object == "referees":
-                    continue 
-                for _, track_info in object_tracks[frame_num].items():
-                    if "speed" in track_info:
-                        speed = track_info.get('speed',None)
-                        distance = track_info.get('distance',None)
-                        if speed is None or distance is None:
-                            continue
-                        
-                        bbox = track_info['bbox']
-                        position = get_foot_position(bbox)
-                        position = list(position)
-                        position[1]+=40
-
-                        position = tuple(map(int,position))
-                        cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
-                        cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+            frame = self.draw_frame_speed_and_distance(frame, frame_num, tracks)
             output_frames.append(frame)
         
-        return output_frames
\ No newline at end of file
+        return output_frames
+
+    def draw_frame_speed_and_distance(self,frame,frame_num,tracks):
+        for object, object_tracks in tracks.items():
+            if object == "ball" or object == "referees":
+                continue 
+            for _, track_info in object_tracks[frame_num].items():
+                if "speed" in track_info:
+                    speed = track_info.get('speed',None)
+                    distance = track_info.get('distance',None)
+                    if speed is None or distance is None:
+                        continue
+                    
+                    frame = draw_speed_and_distance_text(frame, track_info['bbox'], speed, distance)
+        return frame
\ No newline at end of file
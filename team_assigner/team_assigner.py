@@ -1,12 +1,59 @@
 from sklearn.cluster import KMeans
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import cv2
+import sys
+sys.path.append('../')
+from utils import OBJECT_CLASSES
 
 import numpy as np
 
 
 class TeamAssigner:
-    def __init__(self):
+    # Smallest number of crops handed to one worker. A batched colour call
+    # costs about 0.4 ms plus 30 us per crop (benchmarks/bench_team_workers.py),
+    # so smaller chunks spend more on the repeated fixed cost than they save
+    MIN_CHUNK_SIZE = 64
+
+    def __init__(self, crop_size=16, num_workers=1):
         self.team_colors = {}
         self.player_team_dict = {}
+        # Side of the square the top-half crops are downsampled to for the batched path
+        self.crop_size = crop_size
+        # Crop extraction and colour clustering run on a thread pool; OpenCV
+        # and NumPy release the GIL for most of it
+        self.num_workers = num_workers
+        self.executor = ThreadPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def map_in_chunks(self,function,items):
+        # Splits items into contiguous chunks, one per worker, and concatenates
+        # the results in the original order
+        num_chunks = min(self.num_workers, len(items) // self.MIN_CHUNK_SIZE)
+        if self.executor is None or num_chunks < 2:
+            return function(items)
+        chunks = np.array_split(np.arange(len(items)), num_chunks)
+        return np.concatenate(list(self.executor.map(lambda chunk: function(items[chunk]), chunks)))
+
+    def map_ordered(self,function,arguments):
+        # function(*args) for a stream of argument tuples, run on the thread
+        # pool with at most 2 * num_workers calls in flight (so only that many
+        # frames are held) and yielded in the original order
+        if self.executor is None:
+            for args in arguments:
+                yield function(*args)
+            return
+        pending = collections.deque()
+        for args in arguments:
+            pending.append(self.executor.submit(function, *args))
+            if len(pending) >= 2 * self.num_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
     
@@ -54,6 +101,84 @@ class TeamAssigner:
         return player_color
 
 
+    def get_player_crops(self,frame,bboxes):
+        # Top halves of the player boxes resized to one small common size, so all
+        # crops of a frame cluster together. Nearest-neighbour subsampling keeps
+        # pixel colours unmixed. None marks crops that are too small.
+        crops = []
+        for bbox in bboxes:
+            y1, y2 = max(0, int(bbox[1])), max(0, int(bbox[3]))
+            x1, x2 = max(0, int(bbox[0])), max(0, int(bbox[2]))
+            image = frame[y1:y2, x1:x2]
+            top_half_image = image[0:int(image.shape[0]/2),:]
+            if top_half_image.shape[0] * top_half_image.shape[1] < 2:
+                crops.append(None)
+                continue
+            crops.append(cv2.resize(top_half_image, (self.crop_size, self.crop_size), interpolation=cv2.INTER_NEAREST))
+        return crops
+
+    @staticmethod
+    def batched_two_means(pixels, iterations=10):
+        # Lloyd's 2-means on B images at once, pixels is (B, P, 3). Starts from
+        # the mean of the corner pixels (background) and the pixel farthest from it.
+        pixels = pixels.astype(np.float32)
+        batch = np.arange(len(pixels))
+        size = int(round(np.sqrt(pixels.shape[1])))
+        corners = pixels[:, [0, size - 1, -size, -1]].mean(axis=1)
+        farthest = np.argmax(((pixels - corners[:, None]) ** 2).sum(axis=2), axis=1)
+        centers = np.stack([corners, pixels[batch, farthest]], axis=1)
+
+        totals = pixels.sum(axis=1)
+        for _ in range(iterations):
+            labels = TeamAssigner._nearest_center(pixels, centers)
+            counts = labels.sum(axis=1)[:, None]
+            sums = np.matmul(labels[:, None, :].astype(np.float32), pixels)[:, 0]
+            # Empty clusters keep their previous center
+            background = np.where(counts < pixels.shape[1], (totals - sums) / np.maximum(pixels.shape[1] - counts, 1), centers[:, 0])
+            foreground = np.where(counts > 0, sums / np.maximum(counts, 1), centers[:, 1])
+            centers = np.stack([background, foreground], axis=1).astype(np.float32)
+
+        return TeamAssigner._nearest_center(pixels, centers).astype(int), centers
+
+    @staticmethod
+    def _nearest_center(pixels, centers):
+        # True where a pixel is closer to center 1 than to center 0:
+        # |p - c1|^2 < |p - c0|^2  <=>  2 p.(c1 - c0) > |c1|^2 - |c0|^2
+        direction = centers[:, 1] - centers[:, 0]
+        threshold = (centers[:, 1] ** 2).sum(axis=1) - (centers[:, 0] ** 2).sum(axis=1)
+        return 2 * np.matmul(pixels, direction[:, :, None])[:, :, 0] > threshold[:, None]
+
+    def get_crop_colors(self,crops):
+        # Jersey colours of (N, crop_size, crop_size, 3) crops clustered together
+        return self.map_in_chunks(self._get_crop_colors, np.asarray(crops))
+
+    def _get_crop_colors(self,crops):
+        pixels = np.asarray(crops).reshape(len(crops), -1, 3)
+        labels, centers = self.batched_two_means(pixels)
+
+        # The cluster holding most of the corners is the background; on a tie
+        # cluster 0 is, like max(set(...)) over the per-player corners
+        size = self.crop_size
+        corner_labels = labels[:, [0, size - 1, -size, -1]]
+        non_player_cluster = (corner_labels.sum(axis=1) > 2).astype(int)
+        player_cluster = 1 - non_player_cluster
+        return centers[np.arange(len(pixels)), player_cluster].astype(np.float64)
+
+    def get_player_colors(self,frame,bboxes):
+        # Batched get_player_color: jersey colours of every box in one call as
+        # an (N, 3) array, NaN where the crop is too small
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        return self.map_in_chunks(lambda chunk: self._get_player_colors(frame, chunk), bboxes)
+
+    def _get_player_colors(self,frame,bboxes):
+        player_colors = np.full((len(bboxes), 3), np.nan)
+        crops = self.get_player_crops(frame, bboxes)
+        valid = [i for i, crop in enumerate(crops) if crop is not None]
+        if len(valid) == 0:
+            return player_colors
+        player_colors[valid] = self._get_crop_colors(np.stack([crops[i] for i in valid]))
+        return player_colors
+
     def assign_team_color(self,frame, player_detections):
         
         if len(player_detections) == 0:
@@ -62,12 +187,9 @@ class TeamAssigner:
             self.team_colors[2] = [0, 0, 255]  # Blue
             return
         
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection["bbox"]
-            player_color =  self.get_player_color(frame,bbox)
-            if player_color is not None:
-                player_colors.append(player_color)
+        # All crops of the frame are clustered in one batched call
+        bboxes = [player_detection["bbox"] for player_detection in player_detections.values()]
+        player_colors = [player_color for player_color in self.get_player_colors(frame, bboxes) if not np.isnan(player_color[0])]
         
         print(f"Collected {len(player_colors)} player colors for clustering.")
         if len(player_colors) > 0:
@@ -130,6 +252,171 @@ class TeamAssigner:
         self.player_team_dict[player_id] = team_id
 
         return team_id
-    
 
+    def get_player_teams(self,frame,player_bboxes,player_ids):
+        # Batched get_player_team for all players of a frame: colours are only
+        # extracted for ids seen for the first time, in one call
+        if not hasattr(self, 'kmeans') or self.kmeans is None:
+            for player_id in player_ids:
+                self.player_team_dict.setdefault(player_id, 1)
+        else:
+            new_players = [i for i, player_id in enumerate(player_ids) if player_id not in self.player_team_dict]
+            if len(new_players) > 0:
+                player_colors = self.get_player_colors(frame, [player_bboxes[i] for i in new_players])
+                valid = ~np.isnan(player_colors[:, 0])
+                if valid.any():
+                    team_ids = self.kmeans.predict(player_colors[valid]) + 1
+                    for i, team_id in zip(np.asarray(new_players)[valid], team_ids):
+                        self.player_team_dict[player_ids[i]] = int(team_id)
+
+        # Players without a usable crop default to team 1 and are retried next frame
+        return np.array([self.player_team_dict.get(player_id, 1) for player_id in player_ids], dtype=int)
+
+    def assign_first_sight_teams(self,frames,tracks,scale=1.0):
+        # get_player_teams over a whole video: a track is team 1 until its
+        # first usable crop, then the team of that crop's colour. The crops are
+        # picked here frame by frame, their colours are clustered on the
+        # thread pool and the teams of all player rows filled in at the end.
+        # Returns the team of every player row, in row order.
+        player_rows = np.flatnonzero(tracks.class_mask('players'))
+        row_track_ids = tracks.track_id[player_rows]
+        if not hasattr(self, 'kmeans') or self.kmeans is None:
+            for player_id in np.unique(row_track_ids).tolist():
+                self.player_team_dict.setdefault(player_id, 1)
+            return np.ones(len(player_rows), dtype=int)
+
+        # Track id -> frame of its first usable crop, -1 for ids known before
+        first_sight = dict.fromkeys(self.player_team_dict, -1)
+
+        def color_jobs():
+            for frame_num, frame in zip(range(tracks.num_frames), frames):
+                rows = tracks.rows(frame_num, 'players')
+                new_players = [i for i, player_id in enumerate(tracks.track_id[rows].tolist()) if player_id not in first_sight]
+                if len(new_players) == 0:
+                    continue
+                crops = self.get_player_crops(frame, tracks.bbox[rows][new_players] * scale)
+                valid = [i for i, crop in zip(new_players, crops) if crop is not None]
+                if len(valid) == 0:
+                    continue
+                player_ids = tracks.track_id[rows][valid].tolist()
+                first_sight.update((player_id, frame_num) for player_id in player_ids)
+                yield player_ids, np.stack([crop for crop in crops if crop is not None])
+
+        player_ids, player_colors = [], []
+        for frame_player_ids, frame_colors in self.map_ordered(lambda ids, crops: (ids, self._get_crop_colors(crops)), color_jobs()):
+            player_ids.extend(frame_player_ids)
+            player_colors.append(frame_colors)
+        if len(player_ids) > 0:
+            team_ids = self.kmeans.predict(np.concatenate(player_colors)) + 1
+            self.player_team_dict.update(zip(player_ids, team_ids.tolist()))
+
+        teams = np.ones(len(player_rows), dtype=int)
+        if len(first_sight) > 0:
+            sighted_ids = np.array(sorted(first_sight), dtype=row_track_ids.dtype)
+            sighted_frames = np.array([first_sight[player_id] for player_id in sighted_ids.tolist()])
+            sighted_teams = np.array([self.player_team_dict[player_id] for player_id in sighted_ids.tolist()])
+            index = np.minimum(np.searchsorted(sighted_ids, row_track_ids), len(sighted_ids) - 1)
+            assigned = (sighted_ids[index] == row_track_ids) & (tracks.frame[player_rows] >= sighted_frames[index])
+            teams[assigned] = sighted_teams[index[assigned]]
+        return teams
+
+    def sample_track_crops(self,frames,tracks,samples_per_track=10,scale=1.0,seed=0):
+        # One pass over the video keeping a uniform reservoir sample of at most
+        # samples_per_track player crops per track id. Only crops entering the
+        # reservoir are cut out, so the work is bounded by tracks x samples.
+        rng = np.random.default_rng(seed)
+        player_class = OBJECT_CLASSES.index('players')
+        track_ids = np.unique(tracks.track_id[tracks.object_class == player_class])
+        samples = np.zeros((len(track_ids), samples_per_track, self.crop_size, self.crop_size, 3), dtype=np.uint8)
+        filled = np.zeros((len(track_ids), samples_per_track), dtype=bool)
+        seen = np.zeros(len(track_ids), dtype=np.int64)
+
+        def crop_jobs():
+            # Reservoir slots are drawn here, in frame order, so the sample is
+            # the same for any number of workers
+            for frame_num, frame in zip(range(tracks.num_frames), frames):
+                player_rows = tracks.rows(frame_num, 'players')
+                if player_rows.start == player_rows.stop:
+                    continue
+                track_index = np.searchsorted(track_ids, tracks.track_id[player_rows])
+                seen[track_index] += 1
+                count = seen[track_index]
+                # Algorithm R: the n-th crop of a track replaces a random slot with probability k/n
+                slot = np.where(count <= samples_per_track, count - 1, rng.integers(0, count))
+                selected = np.flatnonzero(slot < samples_per_track)
+                if len(selected) == 0:
+                    continue
+                yield frame, tracks.bbox[player_rows][selected] * scale, track_index[selected], slot[selected]
+
+        def cut_crops(frame, bboxes, crop_track_index, crop_slot):
+            return self.get_player_crops(frame, bboxes), crop_track_index, crop_slot
+
+        # Crops are cut on the thread pool and stored in frame order, a later
+        # crop replacing an earlier one in the same slot
+        for crops, crop_track_index, crop_slot in self.map_ordered(cut_crops, crop_jobs()):
+            for track_index, slot, crop in zip(crop_track_index, crop_slot, crops):
+                if crop is not None:
+                    samples[track_index, slot] = crop
+                    filled[track_index, slot] = True
+        return track_ids, samples, filled
+
+    def fit_track_teams(self,frames,tracks,samples_per_track=10,scale=1.0,seed=0):
+        # Team model fitted on crops sampled across the whole video instead of
+        # frame 0, then one team per track by majority vote over its samples.
+        # Returns (track_ids, teams) and fills team_colors / player_team_dict.
+        track_ids, samples, filled = self.sample_track_crops(frames, tracks, samples_per_track, scale, seed)
+        sample_track, _ = np.nonzero(filled)
+        if len(sample_track) < 2:
+            self.team_colors[1] = [255, 0, 0]  # Red
+            self.team_colors[2] = [0, 0, 255]  # Blue
+            teams = np.ones(len(track_ids), dtype=int)
+            # Recorded so get_team_model caches the fallback like a fitted model
+            self.player_team_dict.update(zip(track_ids.tolist(), teams.tolist()))
+            return track_ids, teams
 
+        player_colors = self.get_crop_colors(samples[filled])
+        kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10, random_state=seed)
+        kmeans.fit(player_colors)
+        self.kmeans = kmeans
+        self.team_colors[1] = kmeans.cluster_centers_[0]
+        self.team_colors[2] = kmeans.cluster_centers_[1]
+
+        votes = np.zeros((len(track_ids), 2), dtype=np.int64)
+        np.add.at(votes, (sample_track, kmeans.labels_), 1)
+        # Ties and tracks without a usable crop go to team 1
+        teams = np.argmax(votes, axis=1) + 1
+        self.player_team_dict.update(zip(track_ids.tolist(), teams.tolist()))
+
+        print(f"Team votes from {len(player_colors)} crops of {int(filled.any(axis=1).sum())} tracks: "
+              f"{ {int(team): int(count) for team, count in zip(*np.unique(teams, return_counts=True))} }")
+        print(f"Team 1 Color: {self.team_colors[1]}")
+        print(f"Team 2 Color: {self.team_colors[2]}")
+        return track_ids, teams
+
+    @staticmethod
+    def lookup_track_teams(track_ids, teams, query_ids):
+        # Team of each query id from sorted (track_ids, teams); ids the model
+        # has never seen (e.g. an empty cached model) go to team 1
+        query_ids = np.asarray(query_ids)
+        result = np.ones(len(query_ids), dtype=np.int64)
+        if len(track_ids) == 0:
+            return result
+        track_index = np.minimum(np.searchsorted(track_ids, query_ids), len(track_ids) - 1)
+        known = track_ids[track_index] == query_ids
+        result[known] = teams[track_index[known]]
+        return result
+
+    def get_team_model(self):
+        # Arrays needed to skip fit_track_teams on a re-render
+        track_ids = np.array(sorted(self.player_team_dict.keys()), dtype=np.int64)
+        return {
+            'team_colors': np.array([self.team_colors[1], self.team_colors[2]], dtype=np.float64),
+            'track_ids': track_ids,
+            'teams': np.array([self.player_team_dict[track_id] for track_id in track_ids.tolist()], dtype=np.int64),
+        }
+
+    def load_team_model(self,arrays):
+        self.team_colors[1] = arrays['team_colors'][0]
+        self.team_colors[2] = arrays['team_colors'][1]
+        self.player_team_dict.update(zip(arrays['track_ids'].tolist(), arrays['teams'].tolist()))
+        return arrays['track_ids'], arrays['teams']
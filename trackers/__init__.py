@@ -1 +1,2 @@
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .model_export import export_model, check_export_options, INFERENCE_BACKENDS
\ No newline at end of file
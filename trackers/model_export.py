@@ -0,0 +1,86 @@
+from ultralytics import YOLO
+import hashlib
+import os
+import shutil
+import tempfile
+import sys
+sys.path.append('../')
+from utils import hash_file
+
+INFERENCE_BACKENDS = ('pytorch', 'onnx', 'openvino')
+
+def check_export_options(backend, int8=False, calibration_data=None):
+    # Options that would be ignored are rejected, they would otherwise still
+    # change the export and result cache keys
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}. Expected one of {INFERENCE_BACKENDS}")
+    if int8 and backend == 'pytorch':
+        raise ValueError("INT8 quantization needs the onnx or openvino backend")
+    if calibration_data is not None and not (int8 and backend == 'openvino'):
+        # ONNX Runtime quantizes dynamically, only OpenVINO calibrates
+        raise ValueError("INT8 calibration data is only used with the openvino backend and int8")
+
+def get_calibration_data_id(calibration_data):
+    # Short content hash of a calibration dataset file, or of its name for
+    # datasets ultralytics resolves itself (e.g. 'coco128.yaml')
+    if calibration_data is None:
+        return None
+    if os.path.isfile(calibration_data):
+        return hash_file(calibration_data)[:8]
+    return hashlib.sha256(str(calibration_data).encode()).hexdigest()[:8]
+
+def get_exported_model_path(model_path, backend, int8=False, calibration_data=None):
+    # Exports live next to the source model, keyed by its content hash so a
+    # retrained best.pt never reuses a stale export
+    model_hash = hash_file(model_path)[:16]
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = '_int8' if int8 else ''
+    if calibration_data is not None:
+        suffix += f"_{get_calibration_data_id(calibration_data)}"
+    if backend == 'onnx':
+        return os.path.join(model_dir, f"{model_name}_{model_hash}{suffix}.onnx")
+    if backend == 'openvino':
+        return os.path.join(model_dir, f"{model_name}_{model_hash}{suffix}_openvino_model")
+    raise ValueError(f"Unknown inference backend: {backend}. Expected one of {INFERENCE_BACKENDS}")
+
+def quantize_onnx_model(onnx_path, output_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+def export_model(model_path, backend='pytorch', int8=False, calibration_data=None):
+    check_export_options(backend, int8, calibration_data)
+    if backend == 'pytorch':
+        return model_path
+
+    exported_path = get_exported_model_path(model_path, backend, int8, calibration_data)
+    if os.path.exists(exported_path):
+        return exported_path
+
+    print(f"Exporting {model_path} to {backend}{' (INT8)' if int8 else ''}...")
+
+    # Export inside a private directory so concurrent jobs never clobber each
+    # other's intermediate files, then move the result into place
+    work_dir = tempfile.mkdtemp(dir=os.path.dirname(exported_path))
+    try:
+        work_model_path = os.path.join(work_dir, os.path.basename(model_path))
+        shutil.copy2(model_path, work_model_path)
+
+        export_args = dict(format=backend, dynamic=True)
+        if backend == 'openvino' and int8:
+            export_args['int8'] = True
+            if calibration_data is not None:
+                export_args['data'] = calibration_data
+        result_path = YOLO(work_model_path).export(**export_args)
+
+        if backend == 'onnx' and int8:
+            # Ultralytics only quantizes OpenVINO exports, use ONNX Runtime for ONNX
+            result_path = quantize_onnx_model(result_path, os.path.join(work_dir, 'model_int8.onnx'))
+
+        if not os.path.exists(exported_path):
+            os.replace(result_path, exported_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return exported_path
@@ -4,17 +4,80 @@ import pickle
 import os
 import numpy as np
 import pandas as pd
-import cv2
 import sys 
 sys.path.append('../')
-from utils import get_center_of_bbox, get_bbox_width, get_foot_position
+from utils import get_center_of_bbox, get_foot_position, batch_frames, TrackStore, TrackStoreBuilder, MatchStats
+from utils import draw_ellipse, draw_triangle, draw_ball_control_panel
+from .model_export import export_model, get_calibration_data_id
 
 class Tracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path) 
+    def __init__(self, model_path, backend='pytorch', int8=False, calibration_data=None,
+                 detection_stride=1, adaptive_stride=False, motion_threshold=0.1, max_buffered_frames=40):
+        # Non-PyTorch backends run through the same ultralytics Results objects,
+        # so sv.Detections.from_ultralytics sees identical outputs
+        inference_model_path = export_model(model_path, backend, int8, calibration_data)
+        if backend == 'pytorch':
+            self.model = YOLO(inference_model_path) 
+        else:
+            self.model = YOLO(inference_model_path, task='detect')
         self.tracker = sv.ByteTrack()
+        self.class_ids = None
+        self.frame_count = 0
+        self.detection_count = 0
+        # Run YOLO every detection_stride frames and interpolate bboxes in between.
+        # In adaptive mode the stride drops to 1 while objects move by more than
+        # motion_threshold bbox heights per frame (player motion or camera pans).
+        self.detection_stride = max(1, int(detection_stride))
+        self.adaptive_stride = adaptive_stride
+        self.motion_threshold = motion_threshold
+        # Strided mode holds every frame between the keyframes of a detection
+        # batch; batches shrink so at most this many frames wait at a time
+        # (never fewer than one stride)
+        self.max_buffered_frames = max_buffered_frames
+        self.batch_size = 20
+        self.conf = 0.1
+        self.imgsz = 640
+        self.backend = backend
+        self.int8 = int8
+        self.calibration_data = calibration_data
+
+    def reset(self):
+        # Forget all tracks, e.g. before starting on a new video
+        self.tracker.reset()
+        self.frame_count = 0
+        self.detection_count = 0
+
+    def get_detection_params(self):
+        # Everything besides the video and model weights that changes the tracks
+        params = {
+            'conf': self.conf,
+            'batch_size': self.batch_size,
+            'imgsz': self.imgsz,
+            'backend': self.backend,
+            'int8': self.int8,
+            'detection_stride': self.detection_stride,
+            'adaptive_stride': self.adaptive_stride,
+            'motion_threshold': self.motion_threshold,
+        }
+        if self.detection_stride > 1 or self.adaptive_stride:
+            # Adaptive stride is re-evaluated after every keyframe batch
+            params['max_buffered_frames'] = self.max_buffered_frames
+        if self.calibration_data is not None:
+            params['calibration_data'] = get_calibration_data_id(self.calibration_data)
+        return params
 
     def add_position_to_tracks(self, tracks):
+        if isinstance(tracks, TrackStore):
+            # Same truncation as get_center_of_bbox / get_foot_position, over all rows at once
+            bbox = tracks.bbox.astype(np.float64)
+            x_center = np.trunc((bbox[:, 0] + bbox[:, 2]) / 2)
+            y_center = np.trunc((bbox[:, 1] + bbox[:, 3]) / 2)
+            y_foot = np.trunc(bbox[:, 3])
+            is_ball = tracks.class_mask('ball')
+            tracks.position[:, 0] = x_center
+            tracks.position[:, 1] = np.where(is_ball, y_center, y_foot)
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():
@@ -26,6 +89,9 @@ class Tracker:
                     tracks[object][frame_num][track_id]['position'] = position
 
     def interpolate_ball_positions(self,ball_positions):
+        if isinstance(ball_positions, TrackStore):
+            return self.interpolate_ball_positions_in_store(ball_positions)
+
         ball_positions = [x.get(1,{}).get('bbox',[]) for x in ball_positions]
         
         # Filter out empty bboxes and ensure all have 4 elements
@@ -51,216 +117,273 @@ class Tracker:
 
         return ball_positions
 
+    def interpolate_ball_positions_in_store(self, tracks):
+        # Rebuilds the ball rows in place with one interpolated bbox per frame
+        ball_positions = np.full((tracks.num_frames, 4), np.nan)
+        ball_rows = np.flatnonzero(tracks.class_mask('ball'))
+        ball_positions[tracks.frame[ball_rows]] = tracks.bbox[ball_rows]
+
+        df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
+        df_ball_positions = df_ball_positions.interpolate()
+        df_ball_positions = df_ball_positions.bfill()
+        df_ball_positions = df_ball_positions.ffill()
+
+        frames = np.arange(tracks.num_frames)
+        tracks.replace_class_rows('ball', frames, np.ones(tracks.num_frames), df_ball_positions.to_numpy())
+        return tracks
+
     def detect_frames(self, frames):
-        batch_size=20 
         detections = [] 
-        for i in range(0,len(frames),batch_size):
-            detections_batch = self.model.predict(frames[i:i+batch_size],conf=0.1)
+        for detections_batch in self.iter_detections(frames):
             detections += detections_batch
         return detections
 
+    def iter_detections(self, frames):
+        # Consume frames lazily so a generator never holds more than one batch
+        for frames_batch in batch_frames(frames, self.batch_size):
+            yield self.model.predict(frames_batch,conf=self.conf,imgsz=self.imgsz)
+
     def get_object_tracks(self, frames, read_from_stub=False, stub_path=None):
         
         if read_from_stub and stub_path is not None and os.path.exists(stub_path):
             with open(stub_path,'rb') as f:
                 tracks = pickle.load(f)
+            # Stubs written before the track store existed hold nested dicts
+            if isinstance(tracks, dict):
+                tracks = TrackStore.from_dict(tracks)
             return tracks
 
-        detections = self.detect_frames(frames)
-
-        tracks={
-            "players":[],
-            "referees":[],
-            "ball":[]
-        }
-
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            cls_names_inv = {v:k for k,v in cls_names.items()}
-
-            # Covert to supervision Detection format
-            detection_supervision = sv.Detections.from_ultralytics(detection)
-
-            # Convert GoalKeeper to player object
-            for object_ind , class_id in enumerate(detection_supervision.class_id):
-                if cls_names[class_id] == "goalkeeper":
-                    detection_supervision.class_id[object_ind] = cls_names_inv["player"]
-
-            # Track Objects
-            detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
-
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
-
-            for frame_detection in detection_with_tracks:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                track_id = frame_detection[4]
-
-                if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox":bbox}
-                
-                if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox":bbox}
-            
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-
-                if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox":bbox}
+        self.reset()
+        builder = TrackStoreBuilder()
+        for frame_num, (_, frame_tracks) in enumerate(self.iter_object_tracks(frames)):
+            builder.add_frame(frame_num, frame_tracks)
+        tracks = builder.build(self.frame_count)
 
         if stub_path is not None:
             with open(stub_path,'wb') as f:
                 pickle.dump(tracks,f)
 
         return tracks
-    
-    def draw_ellipse(self,frame,bbox,color,track_id=None):
-        y2 = int(bbox[3])
-        x_center, _ = get_center_of_bbox(bbox)
-        width = get_bbox_width(bbox)
-
-        cv2.ellipse(
-            frame,
-            center=(x_center,y2),
-            axes=(int(width), int(0.35*width)),
-            angle=0.0,
-            startAngle=-45,
-            endAngle=235,
-            color = color,
-            thickness=2,
-            lineType=cv2.LINE_4
-        )
-
-        rectangle_width = 40
-        rectangle_height=20
-        x1_rect = x_center - rectangle_width//2
-        x2_rect = x_center + rectangle_width//2
-        y1_rect = (y2- rectangle_height//2) +15
-        y2_rect = (y2+ rectangle_height//2) +15
-
-        if track_id is not None:
-            cv2.rectangle(frame,
-                          (int(x1_rect),int(y1_rect) ),
-                          (int(x2_rect),int(y2_rect)),
-                          color,
-                          cv2.FILLED)
-            
-            x1_text = x1_rect+12
-            if track_id > 99:
-                x1_text -=10
-            
-            cv2.putText(
-                frame,
-                f"{track_id}",
-                (int(x1_text),int(y1_rect+15)),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (0,0,0),
-                2
-            )
-
-        return frame
 
-    def draw_triangle(self,frame,bbox,color):
-        if len(bbox) < 4 or np.isnan(bbox).any():
-            return frame
+    def update(self, frame):
+        # Online tracking of a single frame (e.g. a live feed); ByteTrack state
+        # carries over between calls
+        return self.update_batch([frame])[0]
+
+    def update_batch(self, frames):
+        # Returns, per frame, {object_name: (track_ids, bboxes)}
+        frames_tracks = self.detect_and_track(frames)
+        self.frame_count += len(frames_tracks)
+        return frames_tracks
+
+    def detect_and_track(self, frames):
+        detections = self.model.predict(list(frames),conf=self.conf,imgsz=self.imgsz)
+        return [self.track_detection(detection) for detection in detections]
+
+    def iter_object_tracks(self, frames):
+        # Yields (frame, frame_tracks) as soon as each detection batch completes,
+        # so downstream stages can work on early frames while later ones are inferred
+        if self.detection_stride == 1 and not self.adaptive_stride:
+            for frames_batch in batch_frames(frames, self.batch_size):
+                for frame, frame_tracks in zip(frames_batch, self.update_batch(frames_batch)):
+                    yield frame, frame_tracks
+            return
+
+        # Strided mode: frames are buffered until the last keyframe of a batch
+        # is tracked, stride frames per keyframe, so batches hold at most
+        # max_buffered_frames // stride keyframes (and at most batch_size)
+        stride = self.detection_stride
+        buffered_frames = []
+        keyframe_indices = []
+        frames_since_keyframe = None
+        previous_keyframe = None
+        for frame in frames:
+            if frames_since_keyframe is None or frames_since_keyframe >= stride:
+                keyframe_indices.append(len(buffered_frames))
+                frames_since_keyframe = 0
+            buffered_frames.append(frame)
+            frames_since_keyframe += 1
+
+            keyframes_per_batch = max(1, min(self.batch_size, self.max_buffered_frames // stride))
+            if len(keyframe_indices) >= keyframes_per_batch and frames_since_keyframe == 1:
+                previous_keyframe, motion = yield from self._flush_keyframes(buffered_frames, keyframe_indices, previous_keyframe)
+                buffered_frames = []
+                keyframe_indices = []
+                if self.adaptive_stride:
+                    stride = 1 if motion > self.motion_threshold else self.detection_stride
+
+        if len(buffered_frames) > 0:
+            # The last frame closes the final interval so it can be interpolated
+            if len(keyframe_indices) == 0 or keyframe_indices[-1] != len(buffered_frames) - 1:
+                keyframe_indices.append(len(buffered_frames) - 1)
+            yield from self._flush_keyframes(buffered_frames, keyframe_indices, previous_keyframe)
+
+    def _flush_keyframes(self, buffered_frames, keyframe_indices, previous_keyframe):
+        keyframe_tracks = self.detect_and_track([buffered_frames[i] for i in keyframe_indices])
+
+        # The buffer starts right after the previous batch's last keyframe
+        if previous_keyframe is not None:
+            left_index, left_tracks = -1, previous_keyframe
+        else:
+            left_index, left_tracks = keyframe_indices[0], keyframe_tracks[0]
+            self.frame_count += 1
+            yield buffered_frames[left_index], left_tracks
+
+        max_motion = 0.0
+        for right_index, right_tracks in zip(keyframe_indices, keyframe_tracks):
+            if right_index == left_index:
+                continue
+            gap = right_index - left_index
+            max_motion = max(max_motion, self.measure_track_motion(left_tracks, right_tracks, gap))
+            for i in range(left_index + 1, right_index):
+                self.frame_count += 1
+                yield buffered_frames[i], self.interpolate_frame_tracks(left_tracks, right_tracks, (i - left_index) / gap)
+            self.frame_count += 1
+            yield buffered_frames[right_index], right_tracks
+            left_index, left_tracks = right_index, right_tracks
+
+        return left_tracks, max_motion
+
+    @staticmethod
+    def interpolate_frame_tracks(left_tracks, right_tracks, t):
+        # Linear bbox interpolation per track id, like interpolate_ball_positions
+        # but for players and referees; ids missing at either keyframe are dropped
+        # and the ball is left to interpolate_ball_positions
+        frame_tracks = {}
+        for object_name, (left_ids, left_bboxes) in left_tracks.items():
+            right_ids, right_bboxes = right_tracks[object_name]
+            if object_name == 'ball':
+                frame_tracks[object_name] = (left_ids[:0], left_bboxes[:0])
+                continue
+            track_ids, left_index, right_index = np.intersect1d(left_ids, right_ids, return_indices=True)
+            bboxes = left_bboxes[left_index] + (right_bboxes[right_index] - left_bboxes[left_index]) * t
+            frame_tracks[object_name] = (track_ids, bboxes.astype(np.float32))
+        return frame_tracks
+
+    @staticmethod
+    def measure_track_motion(left_tracks, right_tracks, gap):
+        # Median per-frame displacement of tracked players, in bbox heights
+        left_ids, left_bboxes = left_tracks['players']
+        right_ids, right_bboxes = right_tracks['players']
+        _, left_index, right_index = np.intersect1d(left_ids, right_ids, return_indices=True)
+        if len(left_index) == 0:
+            return 0.0
+        left_bboxes = left_bboxes[left_index]
+        right_bboxes = right_bboxes[right_index]
+        left_centers = (left_bboxes[:, :2] + left_bboxes[:, 2:]) / 2
+        right_centers = (right_bboxes[:, :2] + right_bboxes[:, 2:]) / 2
+        heights = np.maximum(left_bboxes[:, 3] - left_bboxes[:, 1], 1)
+        displacement = np.linalg.norm(right_centers - left_centers, axis=1) / heights / gap
+        return float(np.median(displacement))
+
+    def track_detection(self, detection):
+        # Class names are the same for every result, resolve them once
+        if self.class_ids is None:
+            self.class_ids = self.get_class_ids(detection.names)
+        class_ids = self.class_ids
+
+        # Covert to supervision Detection format
+        detection_supervision = sv.Detections.from_ultralytics(detection)
+
+        # Convert GoalKeeper to player object
+        if class_ids['goalkeeper'] is not None:
+            detection_supervision.class_id[detection_supervision.class_id == class_ids['goalkeeper']] = class_ids['player']
+
+        # Track Objects
+        detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+        self.detection_count += 1
+
+        return self.split_detections(detection_supervision, detection_with_tracks, class_ids)
+
+    @staticmethod
+    def get_class_ids(cls_names):
+        cls_names_inv = {v:k for k,v in cls_names.items()}
+        return {
+            'player': cls_names_inv['player'],
+            'goalkeeper': cls_names_inv.get('goalkeeper'),
+            'referee': cls_names_inv['referee'],
+            'ball': cls_names_inv['ball'],
+        }
 
-        y= int(bbox[1])
-        x,_ = get_center_of_bbox(bbox)
+    @staticmethod
+    def split_detections(detection_supervision, detection_with_tracks, class_ids):
+        # Masks over the whole sv.Detections arrays instead of iterating rows
+        frame_tracks = {}
+        for object_name, class_name in (('players', 'player'), ('referees', 'referee')):
+            mask = detection_with_tracks.class_id == class_ids[class_name]
+            frame_tracks[object_name] = (detection_with_tracks.tracker_id[mask], detection_with_tracks.xyxy[mask])
+
+        # The ball is not tracked, keep the most confident detection
+        ball_indices = np.flatnonzero(detection_supervision.class_id == class_ids['ball'])
+        if len(ball_indices) > 0 and detection_supervision.confidence is not None:
+            ball_indices = ball_indices[[np.argmax(detection_supervision.confidence[ball_indices])]]
+        else:
+            ball_indices = ball_indices[-1:]
+        frame_tracks['ball'] = (np.ones(len(ball_indices), dtype=np.int32), detection_supervision.xyxy[ball_indices])
 
-        triangle_points = np.array([
-            [x,y],
-            [x-10,y-20],
-            [x+10,y-20],
-        ])
-        cv2.drawContours(frame, [triangle_points],0,color, cv2.FILLED)
-        cv2.drawContours(frame, [triangle_points],0,(0,0,0), 2)
+        return frame_tracks
+    
+    def draw_ellipse(self,frame,bbox,color,track_id=None):
+        return draw_ellipse(frame, bbox, color, track_id)
 
-        return frame
+    def draw_triangle(self,frame,bbox,color):
+        return draw_triangle(frame, bbox, color)
 
     def draw_team_ball_control(self,frame,frame_num,team_ball_control):
-        # Draw a semi-transparent rectangle 
-        # Get frame dimensions
-        frame_h, frame_w = frame.shape[:2]
-        
-        # Define responsive dimensions
-        overlay_w = int(frame_w * 0.35)  # 35% of width
-        overlay_h = int(frame_h * 0.15)  # 15% of height
-        
-        # Ensure minimum size
-        overlay_w = max(overlay_w, 300)
-        overlay_h = max(overlay_h, 100)
-        
-        # Position at bottom right with padding
-        padding = 20
-        x2 = frame_w - padding
-        y2 = frame_h - padding
-        x1 = x2 - overlay_w
-        y1 = y2 - overlay_h
-        
-        # Draw a semi-transparent rectangle 
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (x1, y1), (x2, y2), (255,255,255), -1 )
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num+1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
-        total_frames = team_1_num_frames + team_2_num_frames
-        if total_frames == 0:
-            team_1 = 0.0
-            team_2 = 0.0
+        if isinstance(team_ball_control, MatchStats):
+            # Running counts, O(1) per frame
+            team_1, team_2 = team_ball_control.get_possession(frame_num)
         else:
-            team_1 = team_1_num_frames/total_frames
-            team_2 = team_2_num_frames/total_frames
-        
-        # Calculate text position and scale
-        font_scale = frame_w / 2000  # Responsive font scale
-        font_scale = max(font_scale, 0.6) # Minimum font size
+            team_ball_control_till_frame = team_ball_control[:frame_num+1]
+            # Get the number of time each team had ball control
+            team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==1].shape[0]
+            team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame==2].shape[0]
+            total_frames = team_1_num_frames + team_2_num_frames
+            if total_frames == 0:
+                team_1 = 0.0
+                team_2 = 0.0
+            else:
+                team_1 = team_1_num_frames/total_frames
+                team_2 = team_2_num_frames/total_frames
         
-        text_x = x1 + int(overlay_w * 0.1)
-        text_y1 = y1 + int(overlay_h * 0.4)
-        text_y2 = y1 + int(overlay_h * 0.8)
-
-        cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(text_x, text_y1), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
-        cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(text_x, text_y2), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
-
-        return frame
+        return draw_ball_control_panel(frame, team_1, team_2)
 
     def draw_annotations(self,video_frames, tracks,team_ball_control):
         output_video_frames= []
+        if not isinstance(team_ball_control, MatchStats):
+            # Running possession counts instead of rescanning earlier frames every frame
+            team_ball_control = MatchStats(team_ball_control)
         for frame_num, frame in enumerate(video_frames):
             frame = frame.copy()
+            frame = self.draw_frame_annotations(frame, frame_num, tracks, team_ball_control)
+            output_video_frames.append(frame)
 
-            player_dict = tracks["players"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
+        return output_video_frames
 
-            # Draw Players
-            for track_id, player in player_dict.items():
-                color = player.get("team_color",(0,0,255))
-                frame = self.draw_ellipse(frame, player["bbox"],color, track_id)
+    def draw_frame_annotations(self,frame,frame_num,tracks,team_ball_control):
+        # Draws in place so a streaming pipeline can annotate one frame at a time
+        player_dict = tracks["players"][frame_num]
+        ball_dict = tracks["ball"][frame_num]
+        referee_dict = tracks["referees"][frame_num]
 
-                if player.get('has_ball',False):
-                    frame = self.draw_triangle(frame, player["bbox"],(0,0,255))
+        # Draw Players
+        for track_id, player in player_dict.items():
+            color = player.get("team_color",(0,0,255))
+            frame = self.draw_ellipse(frame, player["bbox"],color, track_id)
 
-            # Draw Referee
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255))
-            
-            # Draw ball 
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_triangle(frame, ball["bbox"],(0,255,0))
+            if player.get('has_ball',False):
+                frame = self.draw_triangle(frame, player["bbox"],(0,0,255))
 
+        # Draw Referee
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"],(0,255,255))
+        
+        # Draw ball 
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_triangle(frame, ball["bbox"],(0,255,0))
 
-            # Draw Team Ball Control
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
 
-            output_video_frames.append(frame)
+        # Draw Team Ball Control
+        frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
 
-        return output_video_frames
\ No newline at end of file
+        return frame
\ No newline at end of file
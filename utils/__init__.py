@@ -1,2 +1,9 @@
-from .video_utils import read_video, save_video
-from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position
\ No newline at end of file
+from .video_utils import read_video, save_video, get_video_properties, iter_video_frames, batch_frames, resize_frame, scale_frames, open_video_writer, FFmpegVideoWriter
+from .bbox_utils import get_center_of_bbox, get_bbox_width, measure_distance,measure_xy_distance,get_foot_position
+from .prefetch_reader import PrefetchingVideoReader
+from .file_utils import hash_file, atomic_write
+from .track_store import TrackStore, TrackStoreBuilder, OBJECT_CLASSES
+from .result_cache import ResultCache
+from .frame_cache import FrameProductCache
+from .match_stats import MatchStats
+from .drawing_utils import draw_ellipse, draw_triangle, blend_rectangle, draw_ball_control_panel, draw_camera_movement_panel, draw_speed_and_distance_text, bgr_to_hex
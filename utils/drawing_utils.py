@@ -0,0 +1,142 @@
+import functools
+import cv2
+import numpy as np
+from .bbox_utils import get_center_of_bbox, get_bbox_width, get_foot_position
+
+def draw_ellipse(frame,bbox,color,track_id=None):
+    y2 = int(bbox[3])
+    x_center, _ = get_center_of_bbox(bbox)
+    width = get_bbox_width(bbox)
+
+    cv2.ellipse(
+        frame,
+        center=(x_center,y2),
+        axes=(int(width), int(0.35*width)),
+        angle=0.0,
+        startAngle=-45,
+        endAngle=235,
+        color = color,
+        thickness=2,
+        lineType=cv2.LINE_4
+    )
+
+    rectangle_width = 40
+    rectangle_height=20
+    x1_rect = x_center - rectangle_width//2
+    x2_rect = x_center + rectangle_width//2
+    y1_rect = (y2- rectangle_height//2) +15
+    y2_rect = (y2+ rectangle_height//2) +15
+
+    if track_id is not None:
+        cv2.rectangle(frame,
+                      (int(x1_rect),int(y1_rect) ),
+                      (int(x2_rect),int(y2_rect)),
+                      color,
+                      cv2.FILLED)
+
+        x1_text = x1_rect+12
+        if track_id > 99:
+            x1_text -=10
+
+        cv2.putText(
+            frame,
+            f"{track_id}",
+            (int(x1_text),int(y1_rect+15)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0,0,0),
+            2
+        )
+
+    return frame
+
+def draw_triangle(frame,bbox,color):
+    if len(bbox) < 4 or np.isnan(bbox).any():
+        return frame
+
+    y= int(bbox[1])
+    x,_ = get_center_of_bbox(bbox)
+
+    triangle_points = np.array([
+        [x,y],
+        [x-10,y-20],
+        [x+10,y-20],
+    ])
+    cv2.drawContours(frame, [triangle_points],0,color, cv2.FILLED)
+    cv2.drawContours(frame, [triangle_points],0,(0,0,0), 2)
+
+    return frame
+
+def bgr_to_hex(bgr):
+    return f"#{int(bgr[2]):02x}{int(bgr[1]):02x}{int(bgr[0]):02x}"
+
+@functools.lru_cache(maxsize=16)
+def _solid_block(shape, color):
+    # Read-only, shared between frames and render threads
+    block = np.empty(shape, dtype=np.uint8)
+    block[:] = color
+    block.flags.writeable = False
+    return block
+
+def blend_rectangle(frame,pt1,pt2,color,alpha):
+    # Same pixels as filling the rectangle on a full-frame copy and
+    # cv2.addWeighted-ing it back, but only the rectangle is touched
+    frame_h, frame_w = frame.shape[:2]
+    x1, y1 = max(pt1[0], 0), max(pt1[1], 0)
+    x2, y2 = min(pt2[0], frame_w - 1), min(pt2[1], frame_h - 1)
+    if x1 > x2 or y1 > y2:
+        return frame
+    roi = frame[y1:y2+1, x1:x2+1]
+    roi[:] = cv2.addWeighted(_solid_block(roi.shape, tuple(color)), alpha, roi, 1 - alpha, 0)
+    return frame
+
+def draw_ball_control_panel(frame,team_1,team_2):
+    # Get frame dimensions
+    frame_h, frame_w = frame.shape[:2]
+
+    # Define responsive dimensions
+    overlay_w = int(frame_w * 0.35)  # 35% of width
+    overlay_h = int(frame_h * 0.15)  # 15% of height
+
+    # Ensure minimum size
+    overlay_w = max(overlay_w, 300)
+    overlay_h = max(overlay_h, 100)
+
+    # Position at bottom right with padding
+    padding = 20
+    x2 = frame_w - padding
+    y2 = frame_h - padding
+    x1 = x2 - overlay_w
+    y1 = y2 - overlay_h
+
+    # Draw a semi-transparent rectangle
+    blend_rectangle(frame, (x1, y1), (x2, y2), (255,255,255), 0.4)
+
+    # Calculate text position and scale
+    font_scale = frame_w / 2000  # Responsive font scale
+    font_scale = max(font_scale, 0.6) # Minimum font size
+
+    text_x = x1 + int(overlay_w * 0.1)
+    text_y1 = y1 + int(overlay_h * 0.4)
+    text_y2 = y1 + int(overlay_h * 0.8)
+
+    cv2.putText(frame, f"Team 1 Ball Control: {team_1*100:.2f}%",(text_x, text_y1), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
+    cv2.putText(frame, f"Team 2 Ball Control: {team_2*100:.2f}%",(text_x, text_y2), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0,0,0), 2)
+
+    return frame
+
+def draw_camera_movement_panel(frame,x_movement,y_movement):
+    blend_rectangle(frame, (0,0), (500,100), (255,255,255), 0.6)
+    cv2.putText(frame,f"Camera Movement X: {x_movement:.2f}",(10,30), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+    cv2.putText(frame,f"Camera Movement Y: {y_movement:.2f}",(10,60), cv2.FONT_HERSHEY_SIMPLEX,1,(0,0,0),3)
+    return frame
+
+def draw_speed_and_distance_text(frame,bbox,speed,distance):
+    position = get_foot_position(bbox)
+    position = list(position)
+    position[1]+=40
+
+    position = tuple(map(int,position))
+    cv2.putText(frame, f"{speed:.2f} km/h",position,cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+    cv2.putText(frame, f"{distance:.2f} m",(position[0],position[1]+20),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,0),2)
+    return frame
@@ -0,0 +1,30 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+
+def hash_file(path, chunk_size=1 << 20):
+    # Stream the file so large videos and models are never loaded into memory
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    # Write to a temporary file next to `path` and move it into place once
+    # complete, so readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=os.path.splitext(path)[1] + '.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,61 @@
+import threading
+
+class FrameProductCache():
+    # Prefix store for images derived from decoded frames, e.g. the
+    # downsampled analysis frame, keyed by (frame_index, product). Every
+    # analysis pass reads the video from frame 0, so once max_bytes is used up
+    # new entries are no longer stored: the first frames that fit are shared
+    # by all later passes and frames past the budget are derived again by
+    # each pass (LRU would evict every frame before the next pass reached it).
+    # Products returning the frame itself (e.g. scale 1) are never stored.
+    def __init__(self, products, max_bytes=256 * 1024**2):
+        self.max_bytes = max_bytes
+        self.products = dict(products)
+        self.entries = {}
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped': self.skipped,
+            'hit_rate': round(self.hits / lookups, 3) if lookups > 0 else 0.0,
+            'entries': len(self.entries),
+            'size_bytes': self.size_bytes,
+        }
+
+    def get(self, frame_index, product, frame):
+        # `frame` is the image the product is derived from, it is only used on a miss
+        if product not in self.products:
+            raise KeyError(f"Unknown frame product: {product}")
+        key = (frame_index, product)
+        with self.lock:
+            image = self.entries.get(key)
+            if image is not None:
+                self.hits += 1
+                return image
+
+        image = self.products[product](frame)
+        if image is frame:
+            return image
+        with self.lock:
+            self.misses += 1
+            if self.size_bytes + image.nbytes > self.max_bytes:
+                self.skipped += 1
+            elif key not in self.entries:
+                self.entries[key] = image
+                self.size_bytes += image.nbytes
+        return image
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size_bytes = 0
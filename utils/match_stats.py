@@ -0,0 +1,78 @@
+import numpy as np
+
+TEAMS = (1, 2)
+
+class MatchStats():
+    # Running match statistics for every frame, built in one pass over the
+    # tracks: frames of ball possession per team, each team's top speed so far
+    # and the distance covered so far by its players. Everything is stored as
+    # cumulative per-frame arrays, so the state at any frame is an O(1) lookup
+    # and renderers never rescan the frames before the current one. Without a
+    # TrackStore only possession is tracked.
+    def __init__(self, team_ball_control, tracks=None):
+        team_ball_control = np.asarray(team_ball_control)
+        self.num_frames = len(team_ball_control)
+        self.possession_frames = {team: np.cumsum(team_ball_control == team) for team in TEAMS}
+        self.max_speed = {team: np.zeros(self.num_frames) for team in TEAMS}
+        self.total_distance = {team: np.zeros(self.num_frames) for team in TEAMS}
+        if tracks is not None:
+            self._add_player_stats(tracks)
+
+    def _add_player_stats(self, tracks):
+        is_player = tracks.class_mask('players')
+        frames = tracks.frame.astype(np.int64)
+        speeds = np.nan_to_num(tracks.speed)
+        distances = np.nan_to_num(tracks.distance)
+        for team in TEAMS:
+            team_rows = np.flatnonzero(is_player & (tracks.team == team))
+
+            frame_max_speed = np.zeros(self.num_frames)
+            np.maximum.at(frame_max_speed, frames[team_rows], speeds[team_rows])
+            self.max_speed[team] = np.maximum.accumulate(frame_max_speed)
+
+            # Distance is cumulative, so a player's contribution is the largest
+            # value seen so far; the team total grows by each new maximum
+            frame_distance = np.zeros(self.num_frames)
+            if len(team_rows):
+                track_ids = tracks.track_id[team_rows]
+                order = np.lexsort((frames[team_rows], track_ids))
+                team_rows, track_ids = team_rows[order], track_ids[order]
+                running_max = self._segment_running_max(distances[team_rows], track_ids)
+                first = np.r_[True, track_ids[1:] != track_ids[:-1]]
+                increase = np.where(first, running_max, running_max - np.r_[0.0, running_max[:-1]])
+                np.add.at(frame_distance, frames[team_rows], increase)
+            self.total_distance[team] = np.cumsum(frame_distance)
+
+    @staticmethod
+    def _segment_running_max(values, segments):
+        # Running maximum restarting at each segment of a sorted segment array,
+        # done on integer value ranks so the segment offsets stay exact
+        unique_values, ranks = np.unique(values, return_inverse=True)
+        _, segment_index = np.unique(segments, return_inverse=True)
+        offset = segment_index.astype(np.int64) * (len(unique_values) + 1)
+        return unique_values[np.maximum.accumulate(ranks.reshape(-1) + offset) - offset]
+
+    def get_possession(self, frame_num):
+        # Share of the frames up to frame_num each team had the ball, 0 before any possession
+        team_1_frames = self.possession_frames[1][frame_num]
+        team_2_frames = self.possession_frames[2][frame_num]
+        total_frames = team_1_frames + team_2_frames
+        if total_frames == 0:
+            return 0.0, 0.0
+        return team_1_frames / total_frames, team_2_frames / total_frames
+
+    def get_frame_stats(self, frame_num):
+        possession = self.get_possession(frame_num)
+        return {
+            team: {
+                'possession': float(possession[team - 1]),
+                'max_speed': float(self.max_speed[team][frame_num]),
+                'total_distance': float(self.total_distance[team][frame_num]),
+            }
+            for team in TEAMS
+        }
+
+    def get_final_stats(self):
+        if self.num_frames == 0:
+            return {team: {'possession': 0.0, 'max_speed': 0.0, 'total_distance': 0.0} for team in TEAMS}
+        return self.get_frame_stats(self.num_frames - 1)
@@ -0,0 +1,86 @@
+import queue
+import threading
+import time
+import cv2
+
+class PrefetchingVideoReader():
+    # Decodes frames on a background thread so decoding overlaps with the
+    # consumer (e.g. YOLO inference). cv2 releases the GIL while decoding.
+    def __init__(self, video_path, queue_size=32):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.video_path = video_path
+        self.queue_size = queue_size
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames_read = 0
+        self.decode_time = 0.0
+        # Producer waiting on a full queue: the consumer is the bottleneck
+        self.producer_stall_time = 0.0
+        # Consumer waiting on an empty queue: decoding is the bottleneck
+        self.consumer_stall_time = 0.0
+
+    def get_stats(self):
+        return {
+            'frames': self.frames_read,
+            'queue_size': self.queue_size,
+            'decode_time': round(self.decode_time, 3),
+            'producer_stall_time': round(self.producer_stall_time, 3),
+            'consumer_stall_time': round(self.consumer_stall_time, 3),
+        }
+
+    def _decode(self, cap, frame_queue, stop_event):
+        try:
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                self.decode_time += time.perf_counter() - start
+                if not ret:
+                    break
+
+                start = time.perf_counter()
+                while not stop_event.is_set():
+                    try:
+                        frame_queue.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                self.producer_stall_time += time.perf_counter() - start
+        except Exception as e:
+            frame_queue.put(e)
+        finally:
+            cap.release()
+            # Sentinel marking the end of the stream
+            frame_queue.put(None)
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Error opening video file: {self.video_path}")
+
+        frame_queue = queue.Queue(maxsize=self.queue_size)
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self._decode, args=(cap, frame_queue, stop_event), daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                start = time.perf_counter()
+                item = frame_queue.get()
+                self.consumer_stall_time += time.perf_counter() - start
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                self.frames_read += 1
+                yield item
+        finally:
+            # Unblock and stop the decoder if the consumer exits early
+            stop_event.set()
+            while thread.is_alive():
+                try:
+                    frame_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import zipfile
+import zlib
+import numpy as np
+from .file_utils import atomic_write
+
+class ResultCache():
+    # Content-addressed cache of analysis results stored as .npz files.
+    # Keys are hashes of everything the result depends on; the least recently
+    # used entries are evicted once the cache grows past max_size_bytes.
+    def __init__(self, cache_dir, max_size_bytes=5 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(kind, **params):
+        payload = json.dumps({'kind': kind, **params}, sort_keys=True, default=str)
+        return f"{kind}_{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key, required=()):
+        # None on a miss. Entries that cannot be read (truncated or corrupt)
+        # or lack one of the required arrays are misses too, and are deleted
+        # so the result is computed and saved again.
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            missing = [name for name in required if name not in arrays]
+            if missing:
+                raise KeyError(f"Cache entry {key} has no {missing}")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile, zlib.error) as e:
+            print(f"Discarding unreadable cache entry {key}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Refresh the access time used for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arrays
+
+    def save(self, key, arrays):
+        with atomic_write(self._path(key), 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
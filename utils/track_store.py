@@ -0,0 +1,217 @@
+from collections.abc import Mapping, Sequence
+import numpy as np
+
+OBJECT_CLASSES = ("players", "referees", "ball")
+
+class TrackStore():
+    # Columnar track storage with one row per (frame, object class, track id).
+    # Rows are kept sorted by frame then object class, and `index` maps every
+    # (frame, class) pair to its contiguous row range. Missing values are NaN
+    # (team 0 means "not assigned").
+    COLUMNS = ('frame', 'object_class', 'track_id', 'bbox', 'position', 'position_adjusted',
+               'position_transformed', 'speed', 'distance', 'team', 'team_color', 'has_ball')
+
+    def __init__(self, num_frames, frame, object_class, track_id, bbox):
+        frame = np.asarray(frame, dtype=np.int32)
+        object_class = np.asarray(object_class, dtype=np.int8)
+        order = np.lexsort((object_class, frame))
+
+        self.num_frames = num_frames
+        self.frame = frame[order]
+        self.object_class = object_class[order]
+        self.track_id = np.asarray(track_id, dtype=np.int32)[order]
+        self.bbox = np.asarray(bbox, dtype=np.float32).reshape(-1, 4)[order]
+
+        n = len(self.frame)
+        self.position = np.full((n, 2), np.nan, dtype=np.float32)
+        self.position_adjusted = np.full((n, 2), np.nan, dtype=np.float32)
+        self.position_transformed = np.full((n, 2), np.nan, dtype=np.float32)
+        self.speed = np.full(n, np.nan, dtype=np.float64)
+        self.distance = np.full(n, np.nan, dtype=np.float64)
+        self.team = np.zeros(n, dtype=np.int8)
+        self.team_color = np.full((n, 3), np.nan, dtype=np.float32)
+        self.has_ball = np.zeros(n, dtype=bool)
+
+        self._build_index()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _build_index(self):
+        keys = self.frame.astype(np.int64) * len(OBJECT_CLASSES) + self.object_class
+        self.index = np.searchsorted(keys, np.arange(self.num_frames * len(OBJECT_CLASSES) + 1))
+
+    def rows(self, frame_num, object_name=None):
+        # Contiguous row range for a frame, optionally restricted to one object class
+        if object_name is None:
+            start = frame_num * len(OBJECT_CLASSES)
+            end = start + len(OBJECT_CLASSES)
+        else:
+            start = frame_num * len(OBJECT_CLASSES) + OBJECT_CLASSES.index(object_name)
+            end = start + 1
+        return slice(self.index[start], self.index[end])
+
+    def class_mask(self, object_name):
+        return self.object_class == OBJECT_CLASSES.index(object_name)
+
+    def find_row(self, frame_num, object_name, track_id):
+        rows = self.rows(frame_num, object_name)
+        matches = np.flatnonzero(self.track_id[rows] == track_id)
+        if len(matches) == 0:
+            return -1
+        return rows.start + matches[0]
+
+    def rescale(self, factor):
+        # Maps pixel coordinates between resolutions, e.g. from a downsampled
+        # analysis frame back to the source video
+        for column in ('bbox', 'position', 'position_adjusted'):
+            getattr(self, column)[:] *= factor
+
+    def replace_class_rows(self, object_name, frame, track_id, bbox):
+        # Drops every row of one object class and inserts new ones with only a bbox
+        keep = ~self.class_mask(object_name)
+        new_rows = TrackStore(self.num_frames, frame, np.full(len(frame), OBJECT_CLASSES.index(object_name)), track_id, bbox)
+
+        columns = {}
+        for column in self.COLUMNS:
+            columns[column] = np.concatenate([getattr(self, column)[keep], getattr(new_rows, column)])
+        order = np.lexsort((columns['object_class'], columns['frame']))
+        for column in self.COLUMNS:
+            setattr(self, column, columns[column][order])
+        self._build_index()
+
+    def to_arrays(self):
+        arrays = {column: getattr(self, column) for column in self.COLUMNS}
+        arrays['num_frames'] = np.array(self.num_frames)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        store = cls(int(arrays['num_frames']), arrays['frame'], arrays['object_class'], arrays['track_id'], arrays['bbox'])
+        # Rows were saved already sorted, so the remaining columns line up
+        for column in cls.COLUMNS:
+            setattr(store, column, np.array(arrays[column], dtype=getattr(store, column).dtype))
+        store._build_index()
+        return store
+
+    @classmethod
+    def from_dict(cls, tracks):
+        frames, classes, track_ids, bboxes = [], [], [], []
+        num_frames = 0
+        for object_name, object_tracks in tracks.items():
+            num_frames = max(num_frames, len(object_tracks))
+            for frame_num, track in enumerate(object_tracks):
+                for track_id, track_info in track.items():
+                    bbox = track_info.get('bbox', [])
+                    if len(bbox) != 4:
+                        continue
+                    frames.append(frame_num)
+                    classes.append(OBJECT_CLASSES.index(object_name))
+                    track_ids.append(track_id)
+                    bboxes.append(bbox)
+        return cls(num_frames, frames, classes, track_ids, np.asarray(bboxes, dtype=np.float32).reshape(-1, 4))
+
+    def as_dict(self):
+        # Read-only view exposing the legacy tracks[object][frame][track_id] layout
+        return TrackDictView(self)
+
+    def to_dict(self):
+        view = self.as_dict()
+        return {object_name: list(view[object_name]) for object_name in OBJECT_CLASSES}
+
+    def row_to_dict(self, row):
+        track_info = {"bbox": self.bbox[row].tolist()}
+        if not np.isnan(self.position[row, 0]):
+            track_info['position'] = tuple(int(v) for v in self.position[row])
+        if not np.isnan(self.position_adjusted[row, 0]):
+            track_info['position_adjusted'] = tuple(self.position_adjusted[row].tolist())
+            position_transformed = self.position_transformed[row]
+            track_info['position_transformed'] = None if np.isnan(position_transformed[0]) else position_transformed.tolist()
+        if not np.isnan(self.speed[row]):
+            track_info['speed'] = float(self.speed[row])
+            track_info['distance'] = float(self.distance[row])
+        if self.team[row] != 0:
+            track_info['team'] = int(self.team[row])
+            track_info['team_color'] = tuple(self.team_color[row].tolist())
+        if self.has_ball[row]:
+            track_info['has_ball'] = True
+        return track_info
+
+
+class TrackStoreBuilder():
+    # Appends detections frame by frame into preallocated columns that grow
+    # geometrically, then hands them to a TrackStore without per-object objects
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.frame = np.empty(capacity, dtype=np.int32)
+        self.object_class = np.empty(capacity, dtype=np.int8)
+        self.track_id = np.empty(capacity, dtype=np.int32)
+        self.bbox = np.empty((capacity, 4), dtype=np.float32)
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.frame)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for column in ('frame', 'object_class', 'track_id', 'bbox'):
+            old = getattr(self, column)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, column, new)
+
+    def add(self, frame_num, object_name, track_ids, bboxes):
+        count = len(track_ids)
+        if count == 0:
+            return
+        self._reserve(count)
+        end = self.size + count
+        self.frame[self.size:end] = frame_num
+        self.object_class[self.size:end] = OBJECT_CLASSES.index(object_name)
+        self.track_id[self.size:end] = track_ids
+        self.bbox[self.size:end] = bboxes
+        self.size = end
+
+    def add_frame(self, frame_num, frame_tracks):
+        for object_name, (track_ids, bboxes) in frame_tracks.items():
+            self.add(frame_num, object_name, track_ids, bboxes)
+
+    def build(self, num_frames):
+        return TrackStore(num_frames, self.frame[:self.size], self.object_class[:self.size],
+                          self.track_id[:self.size], self.bbox[:self.size])
+
+
+class TrackDictView(Mapping):
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, object_name):
+        if object_name not in OBJECT_CLASSES:
+            raise KeyError(object_name)
+        return ObjectTracksView(self.store, object_name)
+
+    def __iter__(self):
+        return iter(OBJECT_CLASSES)
+
+    def __len__(self):
+        return len(OBJECT_CLASSES)
+
+
+class ObjectTracksView(Sequence):
+    def __init__(self, store, object_name):
+        self.store = store
+        self.object_name = object_name
+
+    def __len__(self):
+        return self.store.num_frames
+
+    def __getitem__(self, frame_num):
+        if isinstance(frame_num, slice):
+            return [self[i] for i in range(*frame_num.indices(len(self)))]
+        if frame_num < 0:
+            frame_num += len(self)
+        if not 0 <= frame_num < len(self):
+            raise IndexError(frame_num)
+        rows = self.store.rows(frame_num, self.object_name)
+        return {int(self.store.track_id[row]): self.store.row_to_dict(row) for row in range(rows.start, rows.stop)}
@@ -1,4 +1,9 @@
 import cv2
+import itertools
+import shutil
+import subprocess
+import tempfile
+import numpy as np
 
 def read_video(video_path):
     cap = cv2.VideoCapture(video_path)
@@ -20,11 +25,137 @@ def read_video(video_path):
         raise ValueError(f"No frames read from video: {video_path}")
     return frames, fps
 
-def save_video(output_video_frames,output_video_path, fps=24):
-    if len(output_video_frames) == 0:
+def get_video_properties(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0:
+        fps = 24  # Default if unable to read
+
+    # Frame count is only an estimate for some containers
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    ret, first_frame = cap.read()
+    cap.release()
+    if not ret:
+        raise ValueError(f"No frames read from video: {video_path}")
+    return first_frame, fps, frame_count
+
+def iter_video_frames(video_path):
+    # Decode lazily so only the current frame is held in memory
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Error opening video file: {video_path}")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+def resize_frame(frame, scale):
+    if scale == 1:
+        return frame
+    height, width = frame.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    # INTER_AREA avoids aliasing when downsampling
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+def scale_frames(frames, scale):
+    for frame in frames:
+        yield resize_frame(frame, scale)
+
+def batch_frames(frames, batch_size):
+    # Works for lists and generators alike, holding at most one batch
+    frames = iter(frames)
+    while True:
+        batch = list(itertools.islice(frames, batch_size))
+        if len(batch) == 0:
+            break
+        yield batch
+
+class FFmpegVideoWriter():
+    # Streams raw BGR frames over a pipe into a single ffmpeg/libx264 process,
+    # mirroring the write/release interface of cv2.VideoWriter
+    def __init__(self, output_video_path, fps, frame_size, preset='fast', crf=23, fragmented=False):
+        width, height = frame_size
+        # Fragmented output is playable while still being written, faststart
+        # moves the index to the front once encoding has finished
+        movflags = 'frag_keyframe+empty_moov' if fragmented else '+faststart'
+        command = [
+            'ffmpeg', '-y',
+            '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-vcodec', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f"{width}x{height}",
+            '-r', str(fps),
+            '-i', '-',
+            '-an',
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', # yuv420p needs even dimensions
+            '-vcodec', 'libx264',
+            '-preset', preset,
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p',
+            '-movflags', movflags,
+            output_video_path
+        ]
+        self.frame_size = (width, height)
+        self.stderr = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.stderr)
+
+    def _error_message(self):
+        self.stderr.seek(0)
+        return self.stderr.read().decode(errors='replace').strip()
+
+    def write(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match writer size {self.frame_size[0]}x{self.frame_size[1]}")
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            self.process.wait()
+            raise RuntimeError(f"FFmpeg encoding failed: {self._error_message()}")
+
+    def release(self):
+        if self.process.stdin.closed:
+            return
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return_code = self.process.wait()
+        error_message = self._error_message()
+        self.stderr.close()
+        if return_code != 0:
+            raise RuntimeError(f"FFmpeg encoding failed: {error_message}")
+
+def open_video_writer(output_video_path, fps, frame_size, backend='opencv', **kwargs):
+    if backend == 'ffmpeg':
+        if shutil.which('ffmpeg') is not None:
+            return FFmpegVideoWriter(output_video_path, fps, frame_size, **kwargs)
+        print("FFmpeg not found, falling back to OpenCV video writer")
+    elif backend != 'opencv':
+        raise ValueError(f"Unknown video writer backend: {backend}")
+    # XVID cannot be muxed into MP4 containers
+    codec = 'mp4v' if output_video_path.lower().endswith('.mp4') else 'XVID'
+    fourcc = cv2.VideoWriter_fourcc(*codec)
+    return cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+
+def save_video(output_video_frames,output_video_path, fps=24, backend='opencv', **kwargs):
+    # Accept any iterable so frames can be rendered and written one at a time
+    output_video_frames = iter(output_video_frames)
+    first_frame = next(output_video_frames, None)
+    if first_frame is None:
         raise ValueError("Cannot save video: no frames provided")
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    out = cv2.VideoWriter(output_video_path, fourcc, fps, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    for frame in output_video_frames:
-        out.write(frame)
-    out.release()
+    out = open_video_writer(output_video_path, fps, (first_frame.shape[1], first_frame.shape[0]), backend=backend, **kwargs)
+    try:
+        out.write(first_frame)
+        for frame in output_video_frames:
+            out.write(frame)
+    finally:
+        out.release()
@@ -1 +1,2 @@
-from .view_transformer import ViewTransformer
\ No newline at end of file
+from .view_transformer import ViewTransformer
+from .calibration import CalibrationProfile, list_profiles, DEFAULT_CALIBRATION_DIR, DEFAULT_PROFILE
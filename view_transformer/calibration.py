@@ -0,0 +1,172 @@
+import functools
+import os
+import re
+import cv2
+import numpy as np
+from utils import atomic_write
+
+DEFAULT_CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'calibration_profiles')
+DEFAULT_PROFILE = 'default'
+
+# Pitch area covered by the default camera angle, in metres
+COURT_WIDTH = 68
+COURT_LENGTH = 23.32
+DEFAULT_TARGET_VERTICES = np.array([
+    [0, COURT_WIDTH],
+    [0, 0],
+    [COURT_LENGTH, 0],
+    [COURT_LENGTH, COURT_WIDTH]
+], dtype=np.float32)
+
+# Original 1080p vertices of the default broadcast angle
+REFERENCE_FRAME_SIZE = (1920, 1080)
+REFERENCE_VERTICES = np.array([
+    [110, 1035],
+    [265, 275],
+    [910, 260],
+    [1640, 915]
+], dtype=np.float32)
+
+PROFILE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def half_plane_inside(x, y, vertices):
+    # True for points inside or on the border of a convex polygon
+    vertices = np.asarray(vertices, dtype=np.float64)
+    area = np.sum(vertices[:, 0] * np.roll(vertices[:, 1], -1) - np.roll(vertices[:, 0], -1) * vertices[:, 1])
+    # Flip the sign for clockwise vertex order
+    orientation = 1.0 if area >= 0 else -1.0
+
+    inside = np.ones(np.broadcast_shapes(np.shape(x), np.shape(y)), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, -1, axis=0)):
+        inside &= orientation * ((x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)) >= 0
+    return inside
+
+def is_convex(vertices):
+    vertices = np.asarray(vertices, dtype=np.float64)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    cross = edges[:, 0] * np.roll(edges[:, 1], -1) - edges[:, 1] * np.roll(edges[:, 0], -1)
+    return bool(np.all(cross >= 0) or np.all(cross <= 0))
+
+class CalibrationProfile():
+    # A camera angle's mapping from image pixels to pitch metres: the pitch
+    # polygon in pixels, the homography and its inverse, and a mask of the
+    # pixels on the pitch, all precomputed for one frame size.
+    def __init__(self, name, frame_size, pixel_vertices, target_vertices, homography, pitch_mask=None):
+        if not PROFILE_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid calibration profile name: {name!r}")
+        pixel_vertices = np.asarray(pixel_vertices, dtype=np.float32).reshape(-1, 2)
+        if not is_convex(pixel_vertices):
+            raise ValueError("Calibration pitch polygon must be convex")
+
+        self.name = name
+        self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+        self.pixel_vertices = pixel_vertices
+        self.target_vertices = np.asarray(target_vertices, dtype=np.float32).reshape(-1, 2)
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.inverse_homography = np.linalg.inv(self.homography)
+        if pitch_mask is None:
+            pitch_mask = self.compute_pitch_mask()
+        self.pitch_mask = np.asarray(pitch_mask, dtype=bool)
+
+    def compute_pitch_mask(self):
+        # Same integer-pixel rule as cv2.pointPolygonTest(...) >= 0
+        width, height = self.frame_size
+        x = np.arange(width, dtype=np.float64)[None, :]
+        y = np.arange(height, dtype=np.float64)[:, None]
+        return half_plane_inside(x, y, self.pixel_vertices)
+
+    @classmethod
+    def from_points(cls, name, pixel_vertices, frame_size, target_vertices=DEFAULT_TARGET_VERTICES):
+        # Four clicked image points and the pitch coordinates they correspond to
+        pixel_vertices = np.asarray(pixel_vertices, dtype=np.float32).reshape(4, 2)
+        target_vertices = np.asarray(target_vertices, dtype=np.float32).reshape(4, 2)
+        homography = cv2.getPerspectiveTransform(pixel_vertices, target_vertices)
+        return cls(name, frame_size, pixel_vertices, target_vertices, homography)
+
+    @classmethod
+    def from_line_fit(cls, name, pixel_points, pitch_points, frame_size, target_vertices=DEFAULT_TARGET_VERTICES):
+        # Least-squares/RANSAC fit on any number (>= 4) of pitch-line landmarks,
+        # e.g. line intersections, with known pitch coordinates. The pitch
+        # polygon is target_vertices projected back into the image.
+        pixel_points = np.asarray(pixel_points, dtype=np.float32).reshape(-1, 2)
+        pitch_points = np.asarray(pitch_points, dtype=np.float32).reshape(-1, 2)
+        if len(pixel_points) < 4 or len(pixel_points) != len(pitch_points):
+            raise ValueError("A pitch-line fit needs at least 4 matching pixel/pitch points")
+        homography, _ = cv2.findHomography(pixel_points, pitch_points, cv2.RANSAC, 0.5)
+        if homography is None:
+            raise ValueError("Could not fit a homography to the given pitch points")
+        target_vertices = np.asarray(target_vertices, dtype=np.float32).reshape(-1, 2)
+        pixel_vertices = cv2.perspectiveTransform(target_vertices.reshape(-1, 1, 2), np.linalg.inv(homography))
+        return cls(name, frame_size, pixel_vertices.reshape(-1, 2), target_vertices, homography)
+
+    @classmethod
+    def default(cls, frame_size=REFERENCE_FRAME_SIZE):
+        # The hardcoded broadcast angle, scaled from 1080p with integer vertices.
+        # Built once per frame size and shared, profiles are never mutated.
+        return _default_profile(tuple(int(v) for v in frame_size))
+
+    @classmethod
+    def _build_default(cls, frame_size):
+        width, height = frame_size
+        pixel_vertices = REFERENCE_VERTICES.copy()
+        pixel_vertices[:, 0] *= width / REFERENCE_FRAME_SIZE[0]
+        pixel_vertices[:, 1] *= height / REFERENCE_FRAME_SIZE[1]
+        pixel_vertices = pixel_vertices.astype(np.int32).astype(np.float32)
+        homography = cv2.getPerspectiveTransform(pixel_vertices, DEFAULT_TARGET_VERTICES)
+        return cls(DEFAULT_PROFILE, frame_size, pixel_vertices, DEFAULT_TARGET_VERTICES, homography)
+
+    def scaled(self, frame_size):
+        # The same calibration for another resolution of the same camera angle
+        frame_size = (int(frame_size[0]), int(frame_size[1]))
+        if frame_size == self.frame_size:
+            return self
+        scale_x = frame_size[0] / self.frame_size[0]
+        scale_y = frame_size[1] / self.frame_size[1]
+        homography = self.homography @ np.diag([1 / scale_x, 1 / scale_y, 1.0])
+        pixel_vertices = self.pixel_vertices * np.array([scale_x, scale_y], dtype=np.float32)
+        return CalibrationProfile(self.name, frame_size, pixel_vertices, self.target_vertices, homography)
+
+    def save(self, calibration_dir=DEFAULT_CALIBRATION_DIR):
+        os.makedirs(calibration_dir, exist_ok=True)
+        path = profile_path(self.name, calibration_dir)
+        with atomic_write(path, 'wb') as f:
+            np.savez_compressed(f, name=np.array(self.name), frame_size=np.array(self.frame_size),
+                                pixel_vertices=self.pixel_vertices, target_vertices=self.target_vertices,
+                                homography=self.homography, inverse_homography=self.inverse_homography,
+                                pitch_mask=self.pitch_mask)
+        return path
+
+    @classmethod
+    def load(cls, name, calibration_dir=DEFAULT_CALIBRATION_DIR):
+        path = profile_path(name, calibration_dir)
+        if not os.path.exists(path):
+            if name == DEFAULT_PROFILE:
+                # Same as no profile: ViewTransformer builds the default for the video's frame size
+                return None
+            raise ValueError(f"Unknown calibration profile: {name}")
+        with np.load(path, allow_pickle=False) as data:
+            profile = cls.__new__(cls)
+            profile.name = str(data['name'])
+            profile.frame_size = tuple(int(v) for v in data['frame_size'])
+            profile.pixel_vertices = data['pixel_vertices']
+            profile.target_vertices = data['target_vertices']
+            profile.homography = data['homography']
+            # Everything was computed when the profile was created
+            profile.inverse_homography = data['inverse_homography']
+            profile.pitch_mask = data['pitch_mask']
+        return profile
+
+@functools.lru_cache(maxsize=8)
+def _default_profile(frame_size):
+    return CalibrationProfile._build_default(frame_size)
+
+def profile_path(name, calibration_dir=DEFAULT_CALIBRATION_DIR):
+    if not PROFILE_NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid calibration profile name: {name!r}")
+    return os.path.join(calibration_dir, f"{name}.npz")
+
+def list_profiles(calibration_dir=DEFAULT_CALIBRATION_DIR):
+    names = {DEFAULT_PROFILE}
+    if os.path.isdir(calibration_dir):
+        names.update(os.path.splitext(name)[0] for name in os.listdir(calibration_dir) if name.endswith('.npz'))
+    return sorted(names)
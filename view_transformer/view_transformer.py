@@ -1,43 +1,24 @@
 import numpy as np 
 import cv2
+import sys 
+sys.path.append('../')
+from utils import TrackStore
+from .calibration import CalibrationProfile, half_plane_inside
 
 class ViewTransformer():
-    def __init__(self, frame_width=1280, frame_height=720):
-        court_width = 68
-        court_length = 23.32
+    def __init__(self, frame_width=1280, frame_height=720, profile=None):
+        # Without a calibration profile the default broadcast angle is used
+        if profile is None:
+            profile = CalibrationProfile.default((frame_width, frame_height))
+        else:
+            profile = profile.scaled((frame_width, frame_height))
+        self.profile = profile
 
-        # Reference resolution (1080p)
-        ref_w = 1920
-        ref_h = 1080
-        
-        # Original 1080p vertices for perspective transform
-        ref_vertices = np.array([
-            [110, 1035], 
-            [265, 275], 
-            [910, 260], 
-            [1640, 915]
-        ])
-        
-        # Scale vertices based on input frame dimensions
-        scale_x = frame_width / ref_w
-        scale_y = frame_height / ref_h
-        
-        self.pixel_vertices = ref_vertices.copy().astype(np.float32)
-        self.pixel_vertices[:, 0] *= scale_x
-        self.pixel_vertices[:, 1] *= scale_y
-        self.pixel_vertices = self.pixel_vertices.astype(np.int32)
-        
-        self.target_vertices = np.array([
-            [0,court_width],
-            [0, 0],
-            [court_length, 0],
-            [court_length, court_width]
-        ])
-
-        self.pixel_vertices = self.pixel_vertices.astype(np.float32)
-        self.target_vertices = self.target_vertices.astype(np.float32)
-
-        self.perspective_transformer = cv2.getPerspectiveTransform(self.pixel_vertices, self.target_vertices)
+        self.pixel_vertices = profile.pixel_vertices
+        self.target_vertices = profile.target_vertices
+        self.perspective_transformer = profile.homography
+        self.inverse_perspective_transformer = profile.inverse_homography
+        self.pitch_mask = profile.pitch_mask
 
     def transform_point(self,point):
         if point is None or len(point) < 2:
@@ -54,7 +35,51 @@ class ViewTransformer():
         except (ValueError, IndexError, TypeError):
             return None
 
+    def is_inside_pitch(self,points):
+        # Vectorized equivalent of cv2.pointPolygonTest(...) >= 0 on integer
+        # pixels. Points in the frame are looked up in the precomputed pitch
+        # mask, the rest (e.g. after camera compensation) are checked against
+        # every edge of the convex pitch polygon.
+        points = np.asarray(points).reshape(-1, 2)
+        x = np.trunc(points[:, 0].astype(np.float64))
+        y = np.trunc(points[:, 1].astype(np.float64))
+        height, width = self.pitch_mask.shape
+        in_frame = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+
+        inside = np.zeros(len(points), dtype=bool)
+        inside[in_frame] = self.pitch_mask[y[in_frame].astype(np.intp), x[in_frame].astype(np.intp)]
+        outside_frame = ~in_frame & ~np.isnan(x) & ~np.isnan(y)
+        inside[outside_frame] = half_plane_inside(x[outside_frame], y[outside_frame], self.pixel_vertices)
+        return inside
+
+    def transform_points(self,points):
+        # Batch version of transform_point for an (N, 2) array of pixel positions.
+        # Returns pitch coordinates as float32 (N, 2), NaN for points off the pitch.
+        points = np.asarray(points).reshape(-1, 2)
+        transformed = np.full(points.shape, np.nan, dtype=np.float32)
+        # NaN positions fail every half-plane check
+        inside = self.is_inside_pitch(points)
+        if not inside.any():
+            return transformed
+
+        # Homography as one matrix multiply in homogeneous coordinates
+        inside_points = points[inside].astype(np.float64)
+        homogeneous = inside_points @ self.perspective_transformer[:, :2].T + self.perspective_transformer[:, 2]
+        transformed[inside] = homogeneous[:, :2] / homogeneous[:, 2:]
+        return transformed
+
+    def pitch_to_pixel(self,points):
+        # Inverse mapping from pitch metres back into image pixels
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        homogeneous = points @ self.inverse_perspective_transformer[:, :2].T + self.inverse_perspective_transformer[:, 2]
+        return (homogeneous[:, :2] / homogeneous[:, 2:]).astype(np.float32)
+
     def add_transformed_position_to_tracks(self,tracks):
+        if isinstance(tracks, TrackStore):
+            # Every position of the whole video in one batch
+            tracks.position_transformed[:] = self.transform_points(tracks.position_adjusted)
+            return
+
         for object, object_tracks in tracks.items():
             for frame_num, track in enumerate(object_tracks):
                 for track_id, track_info in track.items():